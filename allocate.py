@@ -0,0 +1,186 @@
+"""
+Single entry point for the allocation engines
+
+    python -m allocate <filename> [--engine backtrack] [--timeout 100] ...
+
+Engines are registered by name against the module and class implementing
+them ('module:Class'). Solver libraries (eg lpsolve55) are imported by the
+engine when it is used, so a quick run does not pay for the ones it never uses.
+"""
+import argparse
+import contextlib
+import csv
+import importlib
+import json
+import sys
+
+ENGINES = {
+    'backtrack': 'student_selections:SelectionBacktrackSolver',
+    'lp_solve': 'student_selections:SelectionLPSolver',
+    'local_search': 'student_selections:SelectionLocalSearchSolver',
+    'cpsat': 'student_selections:SelectionCPSATSolver',
+}
+
+# engine specific options (argument dest) and the engines supporting them
+ENGINE_OPTIONS = {
+    'lp_file': {'lp_solve'},
+    'seed': {'local_search', 'cpsat'},
+    'objective': {'lp_solve', 'cpsat'},
+}
+
+OUTPUT_FORMATS = ('text', 'csv', 'json')
+
+
+def register_engine(name, target, options=()):
+    """
+    Make an engine available to the CLI
+
+    :param name: name used to select the engine (--engine)
+    :param target: 'module:Class' implementing SelectionSolver
+    :param options: engine specific options (ENGINE_OPTIONS) the engine supports
+    """
+    ENGINES[name] = target
+    for option in options:
+        ENGINE_OPTIONS[option].add(name)
+
+
+def get_engine(name):
+    """Import and return the solver class registered as name"""
+    module_name, class_name = ENGINES[name].split(':')
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def _allocation_rows(selection_set):
+    """The allocations of a set as (crsid, project_code, supervisor, serial)"""
+    return [(sel.student.crsid, sel.project.project_code,
+             sel.project.supervisor_crsid, sel.serial)
+            for sel in selection_set.allocated_selections()]
+
+
+def write_sets(selection_sets, output, output_format='text'):
+    """
+    Write the allocation sets found
+
+    :param selection_sets: list of SelectionList as returned by allocate()
+    :param output: file like object to write to
+    :param output_format: one of OUTPUT_FORMATS
+    """
+    if output_format == 'csv':
+        writer = csv.writer(output)
+        writer.writerow(['set', 'crsid', 'project_code', 'supervisor', 'serial'])
+        for index, selection_set in enumerate(selection_sets):
+            for row in _allocation_rows(selection_set):
+                writer.writerow([index, *row])
+
+    elif output_format == 'json':
+        json.dump([{
+            'total_serial': selection_set.total_serial(),
+            'allocations': [dict(zip(('crsid', 'project_code', 'supervisor', 'serial'), row))
+                            for row in _allocation_rows(selection_set)]
+        } for selection_set in selection_sets], output, indent=2)
+        output.write('\n')
+
+    else:
+        with contextlib.redirect_stdout(output):
+            for selection_set in selection_sets:
+                print()
+                print(f"{len(selection_set)} students in set,\
+ total serials: {selection_set.total_serial()} ")
+                selection_set.print_allocated_set()
+
+
+def add_engine_arguments(parser):
+    """The engine options (shared with batch_solve)"""
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='backtrack')
+    parser.add_argument('--max-proj-students', type=int,
+                        help='max students allocated to a project')
+    parser.add_argument('--max-projects-sup', type=int,
+                        help='max projects allocated to a supervisor')
+    parser.add_argument('--timeout', type=int, help='time budget in seconds')
+    parser.add_argument('--single-student-projects', nargs='*', default=[],
+                        metavar='PROJECT', help='lp safe codes of single student projects')
+    parser.add_argument('--lp-file', help='lp file written by the lp_solve engine')
+    parser.add_argument('--seed', type=int,
+                        help='random seed of the local_search and cpsat engines')
+    parser.add_argument('--objective', choices=('sum', 'lexicographic'),
+                        help='sum of the serials or most first choices, then seconds ...')
+    parser.add_argument('--no-presolve', action='store_true',
+                        help='solve the selections without presolve reductions')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='text')
+
+
+def check_engine_arguments(parser, args):
+    """
+    Exit with a usage error when an option is given the engine does not support
+
+    :param parser: ArgumentParser the engine options were added to
+    :param args: parsed engine options
+    """
+    for option, engines in ENGINE_OPTIONS.items():
+        if getattr(args, option) is not None and args.engine not in engines:
+            parser.error(f"--{option.replace('_', '-')} is not supported by the"
+                         f" {args.engine} engine (only {', '.join(sorted(engines))})")
+
+
+def build_parser():
+    """Command line arguments"""
+    parser = argparse.ArgumentParser(
+        prog='allocate',
+        description='Allocate student project choices')
+    parser.add_argument('filename', help='selections csv (or snapshot) exported from IIBProjects')
+    add_engine_arguments(parser)
+    parser.add_argument('--output', help='write the sets here rather than stdout')
+    return parser
+
+
+def run_engine(filename, args):
+    """
+    Load the selections and allocate them with the engine options
+
+    :param filename: selections csv (or snapshot)
+    :param args: parsed engine options (see add_engine_arguments)
+    :return: (solver, list of SelectionList)
+    """
+    solver = get_engine(args.engine)()
+    solver.load_selections(filename)
+    solver.configure(max_proj_students=args.max_proj_students,
+                     max_projects_sup=args.max_projects_sup,
+                     timeout=args.timeout)
+    if args.lp_file:
+        solver.LP_FILENAME = args.lp_file
+    if args.seed is not None:
+        solver.SEED = args.seed
+    if args.objective:
+        solver.OBJECTIVE = args.objective
+    if args.no_presolve:
+        solver.PRESOLVE = False
+    for project_lp_safe in args.single_student_projects:
+        solver.selection_list.add_single_student_project(project_lp_safe)
+
+    return solver, solver.allocate()
+
+
+def main(argv=None):
+    """Run the selected engine, returns the exit code"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    check_engine_arguments(parser, args)
+
+    # engine progress goes to stderr, leaving stdout for the sets
+    with contextlib.redirect_stdout(sys.stderr):
+        _, selection_sets = run_engine(args.filename, args)
+
+    if args.output:
+        with open(args.output, 'w', newline='', encoding='utf8') as output:
+            write_sets(selection_sets, output, args.format)
+    else:
+        write_sets(selection_sets, sys.stdout, args.format)
+
+    if not selection_sets:
+        print("A solution can NOT be found", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
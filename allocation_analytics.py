@@ -0,0 +1,197 @@
+"""
+Quality of allocation sets, many sets compared at once
+
+The allocation sets (eg returned by allocate() or written by the allocate CLI
+with --format csv) are held as arrays with a row per set and a column per
+student, every measure is then computed for all the sets in one numpy pass:
+
+    python allocation_analytics.py <sets.csv>
+"""
+import csv
+import sys
+
+import numpy as np
+
+
+class AllocationSets:
+    """
+    Allocation sets as arrays
+
+    serial[set, student]      serial of the allocated selection (0 not allocated)
+    project[set, student]     index into projects (-1 not allocated)
+    supervisor[set, student]  index into supervisors (-1 not allocated)
+    """
+
+    def __init__(self, rows, num_sets=None) -> None:
+        """
+        :param rows: (set index, crsid, project_code, supervisor crsid, serial)
+        :param num_sets: number of sets (default one more than the largest set index)
+        """
+        students = {}
+        projects = {}
+        supervisors = {}
+        columns = []
+        for set_index, crsid, project_code, supervisor, serial in rows:
+            columns.append((int(set_index),
+                            students.setdefault(crsid, len(students)),
+                            projects.setdefault(project_code, len(projects)),
+                            supervisors.setdefault(supervisor, len(supervisors)),
+                            int(serial)))
+        self.students = list(students)
+        self.projects = list(projects)
+        self.supervisors = list(supervisors)
+
+        columns = np.array(columns, dtype=np.int64).reshape(-1, 5)
+        set_index, student, project, supervisor, serial = columns.T
+        if num_sets is None:
+            num_sets = int(set_index.max()) + 1 if len(set_index) else 0
+        shape = (num_sets, len(self.students))
+        self.serial = np.zeros(shape, dtype=np.int64)
+        self.project = np.full(shape, -1, dtype=np.int64)
+        self.supervisor = np.full(shape, -1, dtype=np.int64)
+        self.serial[set_index, student] = serial
+        self.project[set_index, student] = project
+        self.supervisor[set_index, student] = supervisor
+
+    @classmethod
+    def from_selection_sets(cls, selection_sets):
+        """
+        The allocated selections of each SelectionList
+
+        :param selection_sets: list of SelectionList as returned by allocate()
+        """
+        return cls(((index, sel.student.crsid, sel.project.project_code,
+                     sel.project.supervisor_crsid, sel.serial)
+                    for index, selection_set in enumerate(selection_sets)
+                    for sel in selection_set.allocated_selections()),
+                   num_sets=len(selection_sets))
+
+    @classmethod
+    def from_csv(cls, filename):
+        """
+        Load the sets written by the allocate CLI (--format csv)
+
+        :param filename: csv with columns set, crsid, project_code, supervisor, serial
+        """
+        with open(filename, newline='', encoding='utf8') as csvfile:
+            reader = csv.DictReader(csvfile)
+            return cls((row['set'], row['crsid'], row['project_code'],
+                        row['supervisor'], row['serial']) for row in reader)
+
+    def __len__(self):
+        return self.serial.shape[0]
+
+    def allocated(self):
+        """Mask of the students allocated in each set"""
+        return self.project >= 0
+
+    def total_serial(self):
+        """Sum of the serials of each set"""
+        return self.serial.sum(axis=1)
+
+    def mean_and_variance(self):
+        """Mean and (population) variance of the allocated serials of each set"""
+        allocated = self.allocated()
+        counts = allocated.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self.serial.sum(axis=1) / counts
+            variance = np.where(allocated, self.serial - mean[:, None], 0.0)
+            variance = (variance ** 2).sum(axis=1) / counts
+        return mean, variance
+
+    def serial_histogram(self, max_serial=None):
+        """
+        Number of students allocated each serial, [set, serial]
+
+        Column 0 counts the students not allocated, serials above max_serial
+        are counted in the last column
+
+        :param max_serial: last column (default the largest serial)
+        """
+        if max_serial is None:
+            max_serial = int(self.serial.max()) if self.serial.size else 0
+        serial = np.minimum(self.serial, max_serial)
+        offsets = np.arange(len(self))[:, None] * (max_serial + 1)
+        return np.bincount((serial + offsets).ravel(),
+                           minlength=len(self) * (max_serial + 1)).reshape(len(self), -1)
+
+    def _load(self, index, size):
+        """Count of the (non negative) index in each set, [set, index]"""
+        allocated = index >= 0
+        rows = np.broadcast_to(np.arange(len(self))[:, None], index.shape)
+        return np.bincount((rows * size + index)[allocated],
+                           minlength=len(self) * size).reshape(len(self), size)
+
+    def supervisor_load(self):
+        """Number of students allocated to each supervisor, [set, supervisor]"""
+        return self._load(self.supervisor, len(self.supervisors))
+
+    def project_load(self):
+        """Number of students allocated to each project, [set, project]"""
+        return self._load(self.project, len(self.projects))
+
+    def projects_allocated_multiple(self, n=2):
+        """
+        The projects allocated at least n times in each set
+
+        :param n: number of times the project has been allocated
+        :return: list (a set each) of {project_code: count}
+        """
+        load = self.project_load()
+        return [{self.projects[project]: int(load[set_index, project])
+                 for project in np.flatnonzero(load[set_index] >= n)}
+                for set_index in range(len(self))]
+
+    def worst_off(self):
+        """
+        The students allocated the highest serial in each set
+
+        :return: list (a set each) of (serial, [crsid, ...])
+        """
+        worst = self.serial.max(axis=1) if self.serial.size else np.zeros(len(self), int)
+        return [(int(worst[set_index]),
+                 [self.students[student]
+                  for student in np.flatnonzero(self.serial[set_index] == worst[set_index])])
+                for set_index in range(len(self))]
+
+    def distances(self):
+        """Number of students allocated a different project, [set, set]"""
+        return (self.project[:, None, :] != self.project[None, :, :]).sum(axis=2)
+
+    def diff(self, first, second):
+        """
+        The students allocated differently by two sets
+
+        :param first: set index
+        :param second: set index
+        :return: list of (crsid, project_code in first, project_code in second)
+        """
+        def _project(index):
+            return self.projects[index] if index >= 0 else None
+
+        return [(self.students[student],
+                 _project(self.project[first, student]),
+                 _project(self.project[second, student]))
+                for student in np.flatnonzero(self.project[first] != self.project[second])]
+
+    def summary(self):
+        """One line per set"""
+        mean, variance = self.mean_and_variance()
+        histogram = self.serial_histogram()
+        lines = []
+        for set_index, (worst, students) in enumerate(self.worst_off()):
+            lines.append(
+                f"set {set_index}: total {self.total_serial()[set_index]},"
+                f" mean {mean[set_index]:.3f}, variance {variance[set_index]:.3f},"
+                f" serials {' '.join(str(count) for count in histogram[set_index, 1:])},"
+                f" not allocated {histogram[set_index, 0]},"
+                f" worst {worst} ({' '.join(students)})")
+        return lines
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print(f"usage: {sys.argv[0]} <sets.csv>")
+    else:
+        for line in AllocationSets.from_csv(sys.argv[1]).summary():
+            print(line)
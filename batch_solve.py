@@ -0,0 +1,235 @@
+"""
+Solve many selection files (cohorts, groups, years) concurrently
+
+    python -m batch_solve <directory|manifest> [--jobs N] [--job-timeout SECONDS]
+        [--output-dir DIR] [--summary FILE] [engine options as allocate but --lp-file]
+
+A directory is every selections csv/snapshot in it, a manifest is a text file
+listing a selections file per line (relative to the manifest, # comments).
+
+Each file is loaded and solved in its own process, at most --jobs at a time.
+A job running longer than --job-timeout is terminated, a job failing or timing
+out does not stop the others. A line is printed as each job finishes and the
+summary csv is written as the jobs finish.
+"""
+import argparse
+from collections import Counter, deque
+import contextlib
+import csv
+import multiprocessing
+from multiprocessing.connection import wait
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from allocate import add_engine_arguments, check_engine_arguments, run_engine, write_sets
+
+SELECTION_EXTENSIONS = ('.csv', '.snap')
+SUMMARY_FIELDS = ['filename', 'status', 'sets', 'students', 'total_serial',
+                  'mean_serial', 'seconds', 'error']
+
+SOLVED = 'solved'
+INFEASIBLE = 'infeasible'
+TIMEOUT = 'timeout'
+ERROR = 'error'
+
+
+def selection_files(source):
+    """
+    The selection files of a directory or manifest
+
+    :param source: directory or manifest filename
+    """
+    if os.path.isdir(source):
+        return [os.path.join(source, name) for name in sorted(os.listdir(source))
+                if name.endswith(SELECTION_EXTENSIONS)]
+
+    directory = os.path.dirname(source)
+    with open(source, encoding='utf8') as manifest:
+        return [os.path.join(directory, line.strip()) for line in manifest
+                if line.strip() and not line.lstrip().startswith('#')]
+
+
+def _output_names(filenames):
+    """A distinct name (for the output files) of each selection file"""
+    names = []
+    taken = set()
+    # suffix last tried for each name
+    suffixes = Counter()
+    for filename in filenames:
+        base = os.path.splitext(os.path.basename(filename))[0]
+        name = base
+        while name in taken:
+            suffixes[base] += 1
+            name = f"{base}_{suffixes[base]}"
+        taken.add(name)
+        names.append(name)
+    return names
+
+
+def _positive_int(value):
+    """argparse type of a count that must be at least 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {number}")
+    return number
+
+
+def solve_job(filename, args, output_name, connection):
+    """
+    Load and solve a selection file, sends the summary row to connection
+
+    :param filename: selections csv (or snapshot)
+    :param args: parsed engine options (see allocate.add_engine_arguments)
+    :param output_name: name of the sets and log files in args.output_dir
+    :param connection: Connection the summary row is sent to
+    """
+    row = {'filename': filename}
+    started = time.time()
+    # jobs running at once must not share the lp_solve file
+    args.lp_file = os.path.join(args.output_dir or tempfile.gettempdir(), output_name+'.lp')
+    try:
+        if args.output_dir:
+            log = open(os.path.join(args.output_dir, output_name+'.log'), 'w', encoding='utf8')
+        else:
+            log = open(os.devnull, 'w', encoding='utf8')
+        with log, contextlib.redirect_stdout(log):
+            solver, selection_sets = run_engine(filename, args)
+
+        row['status'] = SOLVED if selection_sets else INFEASIBLE
+        row['sets'] = len(selection_sets)
+        row['students'] = len(solver.students())
+        if selection_sets:
+            best = min(selection_sets, key=lambda selection_set: selection_set.total_serial())
+            row['total_serial'] = best.total_serial()
+            row['mean_serial'] = round(statistics.mean(
+                sel.serial for sel in best.allocated_selections()), 3)
+
+        if args.output_dir:
+            extension = {'text': 'txt'}.get(args.format, args.format)
+            with open(os.path.join(args.output_dir, output_name+'.'+extension),
+                      'w', newline='', encoding='utf8') as output:
+                write_sets(selection_sets, output, args.format)
+    except Exception as exc:
+        row['status'] = ERROR
+        row['error'] = repr(exc)
+    row['seconds'] = round(time.time() - started, 2)
+    connection.send(row)
+    connection.close()
+
+
+def run_batch(filenames, args, report=None):
+    """
+    Solve the selection files with at most args.jobs processes
+
+    :param filenames: selection files
+    :param args: parsed batch and engine options
+    :param report: function(row) called as each job finishes
+    :return: list of summary rows (in the order the jobs finished)
+    """
+    pending = deque(zip(filenames, _output_names(filenames)))
+    # sentinel: (filename, process, connection, started)
+    running = {}
+    rows = []
+
+    def _finish(row):
+        rows.append(row)
+        if report:
+            report(row)
+
+    while pending or running:
+        while pending and len(running) < args.jobs:
+            filename, output_name = pending.popleft()
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(
+                target=solve_job, args=(filename, args, output_name, sender), daemon=True)
+            process.start()
+            sender.close()
+            running[process.sentinel] = (filename, process, receiver, time.time())
+
+        now = time.time()
+        next_deadline = min(started + args.job_timeout for _, _, _, started in running.values())
+        for sentinel in wait(list(running), timeout=max(0, next_deadline - now)):
+            filename, process, receiver, started = running.pop(sentinel)
+            process.join()
+            if receiver.poll():
+                _finish(receiver.recv())
+            else:
+                _finish({'filename': filename, 'status': ERROR,
+                         'error': f"exit code {process.exitcode}",
+                         'seconds': round(time.time() - started, 2)})
+            receiver.close()
+
+        now = time.time()
+        for sentinel, (filename, process, receiver, started) in list(running.items()):
+            if now - started >= args.job_timeout:
+                process.terminate()
+                process.join()
+                receiver.close()
+                del running[sentinel]
+                _finish({'filename': filename, 'status': TIMEOUT,
+                         'seconds': round(now - started, 2)})
+    return rows
+
+
+def build_parser():
+    """Command line arguments"""
+    parser = argparse.ArgumentParser(
+        prog='batch_solve',
+        description='Allocate the student project choices of many selection files')
+    parser.add_argument('source', help='directory of selection files or a manifest listing them')
+    parser.add_argument('--jobs', type=_positive_int, default=os.cpu_count(),
+                        help='files solved at once (default all cores)')
+    parser.add_argument('--job-timeout', type=float, default=600,
+                        help='seconds before a job is terminated')
+    parser.add_argument('--output-dir', help='write the sets and engine log of each file here')
+    parser.add_argument('--summary', help='write the summary csv here')
+    add_engine_arguments(parser)
+    return parser
+
+
+def main(argv=None):
+    """Solve the batch, returns the exit code (1 if any job did not solve)"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    check_engine_arguments(parser, args)
+    if args.lp_file:
+        parser.error("--lp-file would be shared by the jobs, each job writes"
+                     " <name>.lp in --output-dir (or the temporary directory)")
+    try:
+        filenames = selection_files(args.source)
+    except OSError as exc:
+        parser.error(f"cannot read {args.source}: {exc.strerror}")
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    with contextlib.ExitStack() as stack:
+        writer = None
+        if args.summary:
+            summary = stack.enter_context(open(args.summary, 'w', newline='', encoding='utf8'))
+            writer = csv.DictWriter(summary, fieldnames=SUMMARY_FIELDS)
+            writer.writeheader()
+
+        def _report(row):
+            detail = row.get('error', '')
+            if row['status'] == SOLVED:
+                detail = f"{row['sets']} sets, total serial {row['total_serial']}"
+            print(f"{row['filename']}: {row['status']} ({row['seconds']}s) {detail}", flush=True)
+            if writer:
+                writer.writerow(row)
+                summary.flush()
+
+        started = time.time()
+        rows = run_batch(filenames, args, _report)
+
+    statuses = [row['status'] for row in rows]
+    print(f"{len(rows)} files in {time.time() - started:.1f}s: " +
+          ", ".join(f"{status} {statuses.count(status)}"
+                    for status in (SOLVED, INFEASIBLE, TIMEOUT, ERROR)))
+    return 0 if statuses.count(SOLVED) == len(rows) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
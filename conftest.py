@@ -0,0 +1,16 @@
+import os
+path = os.path.dirname(__file__)
+
+import pytest
+
+from student_selections import SelectionList
+
+
+@pytest.fixture
+def load_selections():
+    """Load a SelectionList from a file relative to the repository eg /fixtures/..."""
+    def _load(filename):
+        selections = SelectionList([])
+        selections.load_selections(path+filename)
+        return selections
+    return _load
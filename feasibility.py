@@ -0,0 +1,268 @@
+"""
+Feasibility: can every student be allocated, before any search
+
+The capacities form a flow network
+
+    source -> student (1) -> project (a selection, 1) -> supervisor (project
+    capacity) -> sink (supervisor capacity)
+
+every student can be allocated exactly when the max flow (Dinic) is the number
+of students. When it is not, the students reachable in the residual network
+from a student left unallocated choose between them projects and supervisors
+with one slot fewer than there are students (Hall's condition fails). The
+projects and supervisors bounding those slots are reported with the capacity
+increases (a single student project allowed more students) that would
+allocate one more student.
+
+Selections already allocated are fixed, they use up the capacity.
+"""
+from collections import Counter, deque, namedtuple
+
+# a capacity increase allocating one more student, feasible if it is enough
+Suggestion = namedtuple("Suggestion", "kind name capacity single_student feasible")
+
+
+class FeasibilityResult:
+    """The max flow and, when not every student can be allocated, why"""
+
+    def __init__(self) -> None:
+        self.feasible = True
+        self.num_students = 0
+        self.max_allocated = 0
+        self.unallocated_students = []
+        # Hall violator: students needing more slots than their choices have
+        self.violating_students = []
+        # (project, remaining capacity) / (crsid, remaining capacity)
+        self.bottleneck_projects = []
+        self.bottleneck_supervisors = []
+        self.suggestions = []
+
+    def report(self):
+        """A summary, with the violating students and suggestions when infeasible"""
+        if self.feasible:
+            return f"feasibility: all {self.num_students} students can be allocated"
+        slots = sum(capacity for _, capacity in self.bottleneck_projects) + \
+            sum(capacity for _, capacity in self.bottleneck_supervisors)
+        lines = [
+            f"feasibility: at most {self.max_allocated} of {self.num_students} students"
+            f" can be allocated",
+            f"  {len(self.violating_students)} students choose between them"
+            f" {slots} places: " +
+            " ".join(student.crsid for student in self.violating_students),
+        ]
+        if self.bottleneck_projects:
+            lines.append("  full projects: " + " ".join(
+                f"{project.project_code} ({capacity})"
+                for project, capacity in self.bottleneck_projects))
+        if self.bottleneck_supervisors:
+            lines.append("  full supervisors: " + " ".join(
+                f"{crsid} ({capacity})" for crsid, capacity in self.bottleneck_supervisors))
+        for suggestion in self.suggestions:
+            change = "allow multiple students" if suggestion.single_student else \
+                f"capacity {suggestion.capacity - 1} -> {suggestion.capacity}"
+            lines.append(f"  suggest {suggestion.kind} {suggestion.name}: {change}"
+                         + (" (feasible)" if suggestion.feasible else ""))
+        return "\n".join(lines)
+
+
+class _FlowNetwork:
+    """Dinic max flow, edge e and its reverse e ^ 1"""
+
+    def __init__(self, size) -> None:
+        self.edges = [[] for _ in range(size)]
+        self.head = []
+        self.capacity = []
+
+    def add_edge(self, tail, head, capacity):
+        """Returns the edge id"""
+        self.edges[tail].append(len(self.head))
+        self.head.append(head)
+        self.capacity.append(capacity)
+        self.edges[head].append(len(self.head))
+        self.head.append(tail)
+        self.capacity.append(0)
+        return len(self.head) - 2
+
+    def reachable(self, start, exclude=None):
+        """The nodes reachable from start along edges with capacity left"""
+        seen = {start}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            for edge in self.edges[node]:
+                head = self.head[edge]
+                if self.capacity[edge] > 0 and head not in seen and head != exclude:
+                    seen.add(head)
+                    queue.append(head)
+        return seen
+
+    def reaching(self, end):
+        """The nodes with a path to end along edges with capacity left"""
+        seen = {end}
+        queue = deque([end])
+        while queue:
+            node = queue.popleft()
+            for edge in self.edges[node]:
+                tail = self.head[edge]
+                # edge ^ 1 is the edge from tail to node
+                if self.capacity[edge ^ 1] > 0 and tail not in seen:
+                    seen.add(tail)
+                    queue.append(tail)
+        return seen
+
+    def _levels(self, source, sink):
+        level = [-1] * len(self.edges)
+        level[source] = 0
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            for edge in self.edges[node]:
+                head = self.head[edge]
+                if self.capacity[edge] > 0 and level[head] < 0:
+                    level[head] = level[node] + 1
+                    queue.append(head)
+        return level if level[sink] >= 0 else None
+
+    def _augment(self, source, sink, level, position):
+        """Push flow along one path of the level graph (iterative), returns the flow"""
+        path = []
+        node = source
+        while node != sink:
+            edges = self.edges[node]
+            while position[node] < len(edges):
+                edge = edges[position[node]]
+                if self.capacity[edge] > 0 and level[self.head[edge]] == level[node] + 1:
+                    break
+                position[node] += 1
+            else:
+                # dead end, not tried again in this phase
+                if not path:
+                    return 0
+                level[node] = -1
+                node = self.head[path.pop() ^ 1]
+                position[node] += 1
+                continue
+            path.append(edge)
+            node = self.head[edge]
+
+        flow = min(self.capacity[edge] for edge in path)
+        for edge in path:
+            self.capacity[edge] -= flow
+            self.capacity[edge ^ 1] += flow
+        return flow
+
+    def max_flow(self, source, sink):
+        flow = 0
+        while (level := self._levels(source, sink)) is not None:
+            position = [0] * len(self.edges)
+            while pushed := self._augment(source, sink, level, position):
+                flow += pushed
+        return flow
+
+
+def _network(students, projects, supervisors, project_caps, supervisor_caps):
+    """
+    The flow network of the unallocated students' choices
+
+    :return: (network, source, sink, student edges, project edges, supervisor edges)
+    """
+    source = 0
+    sink = 1
+    student_node = {crsid: 2 + index for index, crsid in enumerate(students)}
+    project_node = {code: 2 + len(students) + index for index, code in enumerate(projects)}
+    supervisor_node = {crsid: 2 + len(students) + len(projects) + index
+                       for index, crsid in enumerate(supervisors)}
+    network = _FlowNetwork(2 + len(students) + len(projects) + len(supervisors))
+
+    student_edges = {crsid: network.add_edge(source, node, 1)
+                     for crsid, node in student_node.items()}
+    for crsid, choices in students.items():
+        for project_code in choices:
+            network.add_edge(student_node[crsid], project_node[project_code], 1)
+    project_edges = {code: network.add_edge(project_node[code],
+                                            supervisor_node[projects[code].supervisor_crsid],
+                                            project_caps[code])
+                     for code in projects}
+    supervisor_edges = {crsid: network.add_edge(supervisor_node[crsid], sink,
+                                                supervisor_caps[crsid])
+                        for crsid in supervisors}
+    return network, source, sink, student_edges, project_edges, supervisor_edges
+
+
+def check_feasibility(selection_list, project_capacity, supervisor_capacity):
+    """
+    Max flow check that every student can be allocated one of their choices
+
+    :param selection_list: SelectionList to check
+    :param project_capacity: function(project) max students allocated to the project
+    :param supervisor_capacity: function(crsid) max projects allocated to the supervisor
+    :return: FeasibilityResult
+    """
+    result = FeasibilityResult()
+    fixed_students = set()
+    proj_load = Counter()
+    sup_load = Counter()
+    for sel in selection_list:
+        if sel.is_allocated():
+            fixed_students.add(sel.student.crsid)
+            proj_load[sel.project.project_code] += 1
+            sup_load[sel.project.supervisor_crsid] += 1
+
+    # crsid: project codes chosen, in the order met
+    students = {}
+    student_objects = {}
+    projects = {}
+    supervisors = {}
+    for sel in selection_list:
+        if sel.student.crsid in fixed_students or sel.is_allocated():
+            continue
+        students.setdefault(sel.student.crsid, []).append(sel.project.project_code)
+        student_objects.setdefault(sel.student.crsid, sel.student)
+        projects.setdefault(sel.project.project_code, sel.project)
+        supervisors.setdefault(sel.project.supervisor_crsid, None)
+
+    project_caps = {code: max(project_capacity(project) - proj_load[code], 0)
+                    for code, project in projects.items()}
+    supervisor_caps = {crsid: max(supervisor_capacity(crsid) - sup_load[crsid], 0)
+                       for crsid in supervisors}
+
+    network, source, sink, student_edges, project_edges, supervisor_edges = _network(
+        students, projects, supervisors, project_caps, supervisor_caps)
+    flow = network.max_flow(source, sink)
+    result.num_students = len(students) + len(fixed_students)
+    result.max_allocated = flow + len(fixed_students)
+    result.feasible = flow == len(students)
+    if result.feasible:
+        return result
+
+    result.unallocated_students = [student_objects[crsid] for crsid, edge in student_edges.items()
+                                   if network.capacity[edge] > 0]
+    # the residual network from an unallocated student (not through the source)
+    start = network.head[student_edges[result.unallocated_students[0].crsid]]
+    reached = network.reachable(start, exclude=source)
+    result.violating_students = [student_objects[crsid] for crsid, edge in student_edges.items()
+                                 if network.head[edge] in reached]
+    bottleneck_projects = [code for code, edge in project_edges.items()
+                           if network.head[edge ^ 1] in reached
+                           and network.head[edge] not in reached]
+    bottleneck_supervisors = [crsid for crsid, edge in supervisor_edges.items()
+                              if network.head[edge ^ 1] in reached]
+    result.bottleneck_projects = [(projects[code], project_caps[code])
+                                  for code in bottleneck_projects]
+    result.bottleneck_supervisors = [(crsid, supervisor_caps[crsid])
+                                     for crsid in bottleneck_supervisors]
+
+    # one more unit through a full edge out of the violator reaches the sink
+    # when the edge's head still reaches it in the residual network
+    to_sink = network.reaching(sink)
+    feasible = flow + 1 == len(students)
+    for code in bottleneck_projects:
+        if network.head[project_edges[code]] in to_sink:
+            project = projects[code]
+            result.suggestions.append(Suggestion(
+                'project', code, project_capacity(project) + 1,
+                project.allow_multiple is False, feasible))
+    for crsid in bottleneck_supervisors:
+        result.suggestions.append(Suggestion(
+            'supervisor', crsid, supervisor_capacity(crsid) + 1, False, feasible))
+    return result
@@ -3,8 +3,7 @@ Attempt to solve the allocation by LP solve
 """
 import sys
 
-from lpsolve55 import * 
-from student_selections import SelectionList, StudentSelection, SelectionLPSolver
+from student_selections import SelectionLPSolver
 
 if len(sys.argv) < 2:
     print(f"usage: {sys.argv[0]} <filename> [lpfile]")
@@ -19,31 +18,20 @@ else:
     lp_solver.load_selections(sys.argv[1])
     lp_solver.MAX_STUDENT_PROJECTS = 2
     lp_solver.MAX_PROJECTS_SUP = 4
+    lp_solver.LP_FILENAME = solve_file
     
     quit = False
     while True:
             
 
 
-        lp_solver.generate_solve_file(solve_file)
-
+        allocated_sets = lp_solver.allocate()
         print(f"-{solve_file}-")
-        lp = lpsolve('read_LP',solve_file)
-        lpsolve('set_verbose',lp,IMPORTANT)
 
-        answer = lpsolve('solve',lp)
-        if answer != 0:
+        if not allocated_sets:
             print("A solution can NOT be found")
 
         else:
-            names = lpsolve('get_col_name', lp)
-            values = lpsolve('get_variables', lp)[0]
-
-            # update our selection list with allocations -> find based on selection varaible
-            for index, result in enumerate(values):
-                if result == 1:
-                    lp_solver.get_selection_by_lp_variable(names[index]).allocate()
-
             print(f"Projects with multiple students: ({str(len(lp_solver.projects_allocated_multiple(2)))}): "+" ".join(map(lambda proj: proj.lp_safe(), lp_solver.projects_allocated_multiple(2))))
 
         while True:
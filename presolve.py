@@ -0,0 +1,198 @@
+"""
+Presolve: reduce the selections before any engine searches them
+
+Rules applied until nothing changes (a fixpoint):
+
+    duplicate choice    a student choosing a project twice keeps the lower serial
+    single choice       a student with one choice left is allocated it
+    uncontested         a student's best choice is allocated when its project and
+                        supervisor can take every remaining selection they have
+    saturated           once a project/supervisor is full its remaining
+                        selections are removed
+
+Selections already allocated are fixed. The residual selection list holds the
+fixed (allocated) selections and the selections still to be decided, an engine
+solving it solves the original problem.
+
+There is no dominance rule: a choice another choice of the student is better
+than in every way (lower serial, no more contested) is not dropped, the
+engines decide it.
+"""
+from collections import Counter
+
+from student_selections import SelectionList
+
+FIXED_SINGLE = 'single choice'
+FIXED_UNCONTESTED = 'uncontested'
+REMOVED_DUPLICATE = 'duplicate choice'
+REMOVED_ALLOCATED = 'student allocated'
+REMOVED_PROJECT = 'saturated project'
+REMOVED_SUPERVISOR = 'saturated supervisor'
+
+
+class PresolveResult:
+    """What presolve fixed and removed, and the residual selection list"""
+
+    def __init__(self) -> None:
+        self.selection_list = SelectionList([])
+        # (selection, reason)
+        self.fixed = []
+        self.removed = []
+        # constraints that can never bind on the residual selections
+        self.relaxed_supervisors = []
+        self.relaxed_projects = []
+        # students left without any choice (the problem is infeasible)
+        self.infeasible_students = []
+
+    def report(self):
+        """A one line summary"""
+        def _reasons(items):
+            counts = Counter(reason for _, reason in items)
+            return ", ".join(f"{reason} {count}" for reason, count in counts.items())
+
+        unallocated = self.selection_list.unallocated_selections()
+        report = (f"presolve: fixed {len(self.fixed)} students ({_reasons(self.fixed)}),"
+                  f" removed {len(self.removed)} selections ({_reasons(self.removed)}),"
+                  f" {len(self.relaxed_supervisors)} supervisor and"
+                  f" {len(self.relaxed_projects)} project constraints can never bind,"
+                  f" {len(unallocated)} selections of"
+                  f" {len({sel.student.crsid for sel in unallocated})} students remain")
+        if self.infeasible_students:
+            report += ", students without a choice: " + \
+                " ".join(student.crsid for student in self.infeasible_students)
+        return report
+
+
+def presolve(selection_list, project_capacity, supervisor_capacity):
+    """
+    Fix and remove selections until no rule applies
+
+    Fixed selections are allocated (selection.allocate())
+
+    :param selection_list: SelectionList to reduce
+    :param project_capacity: function(project) max students allocated to the project
+    :param supervisor_capacity: function(crsid) max projects allocated to the supervisor
+    :return: PresolveResult
+    """
+    result = PresolveResult()
+    removed = set()
+    proj_load = Counter()
+    sup_load = Counter()
+    # remaining (undecided) selections
+    choices = {}
+    proj_sels = {}
+    sup_sels = {}
+    fixed_students = set()
+
+    for sel in selection_list:
+        if sel.is_allocated():
+            fixed_students.add(sel.student.crsid)
+            proj_load[sel.project.project_code] += 1
+            sup_load[sel.project.supervisor_crsid] += 1
+
+    for sel in selection_list:
+        if sel.is_allocated():
+            continue
+        if sel.student.crsid in fixed_students:
+            removed.add(id(sel))
+            result.removed.append((sel, REMOVED_ALLOCATED))
+            continue
+        student_choices = choices.setdefault(sel.student.crsid, [])
+        duplicate = next((other for other in student_choices
+                          if other.project.project_code == sel.project.project_code), None)
+        if duplicate is not None:
+            drop = sel if sel.serial >= duplicate.serial else duplicate
+            removed.add(id(drop))
+            result.removed.append((drop, REMOVED_DUPLICATE))
+            if drop is sel:
+                continue
+            student_choices.remove(duplicate)
+            proj_sels[duplicate.project.project_code].remove(duplicate)
+            sup_sels[duplicate.project.supervisor_crsid].remove(duplicate)
+        student_choices.append(sel)
+        proj_sels.setdefault(sel.project.project_code, []).append(sel)
+        sup_sels.setdefault(sel.project.supervisor_crsid, []).append(sel)
+
+    for student_choices in choices.values():
+        student_choices.sort(key=lambda sel: sel.serial)
+
+    def _remove(sel, reason):
+        removed.add(id(sel))
+        result.removed.append((sel, reason))
+        choices[sel.student.crsid].remove(sel)
+        proj_sels[sel.project.project_code].remove(sel)
+        sup_sels[sel.project.supervisor_crsid].remove(sel)
+
+    def _fix(sel, reason):
+        sel.allocate()
+        result.fixed.append((sel, reason))
+        project_code = sel.project.project_code
+        crsid = sel.project.supervisor_crsid
+        proj_sels[project_code].remove(sel)
+        sup_sels[crsid].remove(sel)
+        proj_load[project_code] += 1
+        sup_load[crsid] += 1
+        for other in list(choices.pop(sel.student.crsid)):
+            if other is not sel:
+                removed.add(id(other))
+                result.removed.append((other, REMOVED_ALLOCATED))
+                proj_sels[other.project.project_code].remove(other)
+                sup_sels[other.project.supervisor_crsid].remove(other)
+
+        if proj_load[project_code] >= project_capacity(sel.project):
+            for other in list(proj_sels[project_code]):
+                _remove(other, REMOVED_PROJECT)
+        if sup_load[crsid] >= supervisor_capacity(crsid):
+            for other in list(sup_sels[crsid]):
+                _remove(other, REMOVED_SUPERVISOR)
+
+    def _uncontested(sel):
+        project_code = sel.project.project_code
+        crsid = sel.project.supervisor_crsid
+        return (proj_load[project_code] + len(proj_sels[project_code])
+                <= project_capacity(sel.project)
+                and sup_load[crsid] + len(sup_sels[crsid]) <= supervisor_capacity(crsid))
+
+    # projects/supervisors already full from the allocated selections
+    for sel in [sel for student_choices in choices.values() for sel in student_choices]:
+        if proj_load[sel.project.project_code] >= project_capacity(sel.project):
+            _remove(sel, REMOVED_PROJECT)
+        elif sup_load[sel.project.supervisor_crsid] >= \
+                supervisor_capacity(sel.project.supervisor_crsid):
+            _remove(sel, REMOVED_SUPERVISOR)
+
+    changed = True
+    while changed:
+        changed = False
+        for crsid in list(choices):
+            student_choices = choices.get(crsid)
+            if not student_choices:
+                continue
+            if len(student_choices) == 1:
+                _fix(student_choices[0], FIXED_SINGLE)
+                changed = True
+            elif _uncontested(student_choices[0]):
+                _fix(student_choices[0], FIXED_UNCONTESTED)
+                changed = True
+
+    # students left without a choice keep their selections, so the residual
+    # problem stays infeasible for the engine
+    infeasible = {crsid for crsid, student_choices in choices.items() if not student_choices}
+    for sel in selection_list:
+        if sel.student.crsid in infeasible:
+            removed.discard(id(sel))
+            if sel.student not in result.infeasible_students:
+                result.infeasible_students.append(sel.student)
+    result.removed = [(sel, reason) for sel, reason in result.removed
+                      if sel.student.crsid not in infeasible]
+
+    for crsid, sels in sup_sels.items():
+        if sels and sup_load[crsid] + len(sels) <= supervisor_capacity(crsid):
+            result.relaxed_supervisors.append(crsid)
+    for project_code, sels in proj_sels.items():
+        if sels and proj_load[project_code] + len(sels) <= project_capacity(sels[0].project):
+            result.relaxed_projects.append(project_code)
+
+    result.selection_list = SelectionList(
+        [sel for sel in selection_list if id(sel) not in removed])
+    return result
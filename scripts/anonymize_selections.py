@@ -1,42 +1,158 @@
 """
-Load a file containing valid student usernames/crsids convert these to anonymzed values 
+Convert the student and supervisor crsids of selection exports to anonymized values
+
+    python scripts/anonymize_selections.py [--key KEY] [--output-dir DIR] [--jobs N] <filename> ...
+
+Pseudonyms are a keyed hash (HMAC-SHA256) of the crsid, the same key gives
+the same pseudonyms in every file and every run, so anonymized exports can be
+joined. The key is --key or the ANON_KEY environment variable, keep it secret:
+anyone holding it can test guesses of the crsids.
+
+The supervisor part of the project codes (choices and the allocation) is
+rewritten with the supervisor's pseudonym, so project_sup still finds the
+supervisor. Files are streamed a row at a time, several in parallel, a file
+that cannot be anonymized is reported without stopping the others.
 """
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import csv
+import functools
+import hashlib
+import hmac
+import os
+import re
+import secrets
 import sys
 
+# columns of the by student export from IIBProjects
+CRSID_COL = 0
+SURNAME_COL = 1
+PREFERRED_NAME_COL = 2
+PROJECT_COLS = [5, 6, 7, 8, 9, 11]
+
+# as project_sup in student_selections
+PROJECT_SUP = re.compile('^([A-Z])-([^-]*)-')
+
+# project codes recur in many rows, the latest are remembered while a file is read
+PROJECT_CACHE_SIZE = 4096
+
 
-def anonymize_selection_file(filename):
+def pseudonym(key, prefix, value):
     """
-    Convert student names and crsids to anonymous values
+    The keyed pseudonym of a value (empty stays empty)
+
+    :param key: HMAC key (bytes)
+    :param prefix: prepended to the pseudonym eg 'stu'
+    :param value: crsid to replace
+    """
+    if not value:
+        return value
+    return prefix+hmac.new(key, value.encode('utf8'), hashlib.sha256).hexdigest()[:12]
+
+
+def anonymize_project_code(key, project_code):
+    """Replace the supervisor crsid in a project code eg A-abc12-1"""
+    return PROJECT_SUP.sub(
+        lambda match: match.group(1)+"-"+pseudonym(key, "sup", match.group(2))+"-",
+        project_code, count=1)
+
 
-    We could convert the supervisor crsid but slightly more complex as we need to store a lookup
+def anonymize_selection_file(filename, output_filename, key):
     """
-    
+    Convert student names and crsids, and supervisor crsids, to anonymous values
 
+    :param filename: selections csv exported from IIBProjects
+    :param output_filename: anonymized csv to write
+    :param key: HMAC key (bytes)
+    :return: (filename, number of rows)
+    """
     rows = 0
+    project_code = functools.lru_cache(maxsize=PROJECT_CACHE_SIZE)(
+        functools.partial(anonymize_project_code, key))
 
-    with open(filename, newline='', encoding='utf8') as csvfile, open('anon_'+filename, 'w', newline='') as outfile:
+    with open(filename, newline='', encoding='utf8') as csvfile, \
+            open(output_filename, 'w', newline='', encoding='utf8') as outfile:
 
         selectionreader = csv.reader(csvfile, delimiter=',', quotechar='"')
+        selectionwriter = csv.writer(outfile, delimiter=',',
+                                     quotechar='"', quoting=csv.QUOTE_MINIMAL)
 
-        spamwriter = csv.writer(outfile, delimiter=',',
-                            quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        header = next(selectionreader, None)
+        if header is not None:
+            selectionwriter.writerow(header)
 
         for row in selectionreader:
             rows += 1
-            if rows != 1:
-            # TODO: test exists already?
-                row[0] = "stu"+str(rows)
-                row[1] = "firstname"+str(rows)
-                row[2] = "lastname"+str(rows)
+            if len(row) > CRSID_COL:
+                student = pseudonym(key, "stu", row[CRSID_COL])
+                row[CRSID_COL] = student
+                if len(row) > PREFERRED_NAME_COL:
+                    row[SURNAME_COL] = "lastname_"+student
+                    row[PREFERRED_NAME_COL] = "firstname_"+student
+            for col in PROJECT_COLS:
+                if col < len(row) and row[col]:
+                    row[col] = project_code(row[col])
+
+            selectionwriter.writerow(row)
+
+    return filename, rows
+
+
+def output_filename(filename, output_dir=None):
+    """anon_<filename> in output_dir (default the directory of filename)"""
+    directory, basename = os.path.split(filename)
+    return os.path.join(output_dir if output_dir else directory, 'anon_'+basename)
+
+
+def _positive_int(value):
+    """argparse type of a count that must be at least 1 (as batch_solve)"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {number}")
+    return number
+
+
+def build_parser():
+    """Command line arguments"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('filenames', nargs='+', metavar='filename',
+                        help='selections csv exported from IIBProjects')
+    parser.add_argument('--key', help='pseudonym key (default $ANON_KEY)')
+    parser.add_argument('--output-dir', help='write the anon_ files here')
+    parser.add_argument('--jobs', type=_positive_int, help='files anonymized in parallel')
+    return parser
+
+
+def main(argv=None):
+    """Anonymize the files, returns the exit code (1 if any file failed)"""
+    args = build_parser().parse_args(argv)
 
+    key = args.key or os.environ.get('ANON_KEY')
+    if key:
+        key = key.encode('utf8')
+    else:
+        print("warning: no --key or ANON_KEY, using a random key, "
+              "pseudonyms will not match other runs", file=sys.stderr)
+        key = secrets.token_bytes(32)
 
-            spamwriter.writerow(row)
-            selectionreader = csv.reader(csvfile, delimiter=',', quotechar='"')
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
 
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = [executor.submit(anonymize_selection_file, filename,
+                                   output_filename(filename, args.output_dir), key)
+                   for filename in args.filenames]
+        failed = 0
+        for filename, future in zip(args.filenames, futures):
+            try:
+                _, rows = future.result()
+            except Exception as exc:
+                failed += 1
+                print(f"{filename}: not anonymized, {exc!r}", file=sys.stderr)
+            else:
+                print(f"{filename}: {rows} rows anonymized")
+    return 1 if failed else 0
 
 
-if len(sys.argv) != 2:
-    print(f"usage: {sys.argv[0]} <filename>")
-else:
-    anonymize_selection_file(sys.argv[1])
+if __name__ == '__main__':
+    sys.exit(main())
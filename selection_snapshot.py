@@ -0,0 +1,207 @@
+"""
+Binary snapshot of a parsed selections file
+
+Parsing the IIBProjects export (csv + regex for every project code) is repeated
+on every run.  A snapshot stores the already parsed selections as integer coded
+columns plus a string table so later runs (and worker processes) can mmap the
+file and skip the csv parsing entirely.
+
+Layout (little endian, uint32 throughout):
+
+    header      magic, n_strings, blob_len, n_projects, n_selections
+    strings     offsets into the string blob (n_strings + 1)
+    projects    proj_id, project_code (string), supervisor_crsid (string)
+    selections  sel_id, serial, student crsid (string), project (index)
+    blob        utf-8 encoded strings (padded to 4 bytes)
+
+Write a snapshot from a csv:
+
+    python selection_snapshot.py <filename> [snapshot_filename]
+"""
+from array import array
+import mmap
+import os
+import struct
+import sys
+
+from student_selections import Project, SelectionList, Student, StudentSelection
+
+MAGIC = b'ACSNAP01'
+HEADER = struct.Struct('<8sIIII')
+PROJECT_COLUMNS = ('proj_id', 'project_code', 'supervisor_crsid')
+SELECTION_COLUMNS = ('sel_id', 'serial', 'student', 'project')
+
+_NATIVE_LITTLE = sys.byteorder == 'little'
+
+
+def is_snapshot(filename):
+    """Does the file start with the snapshot magic"""
+    with open(filename, 'rb') as snapfile:
+        return snapfile.read(len(MAGIC)) == MAGIC
+
+
+def write_snapshot(selection_list, filename):
+    """
+    Write the selections to a binary snapshot file
+
+    :param selection_list: SelectionList to store
+    :param filename: snapshot file to create
+    """
+    strings = {}
+    projects = {}
+    project_cols = {col: array('I') for col in PROJECT_COLUMNS}
+    selection_cols = {col: array('I') for col in SELECTION_COLUMNS}
+
+    def _intern(value):
+        if value not in strings:
+            strings[value] = len(strings)
+        return strings[value]
+
+    for sel in selection_list:
+        project = sel.project
+        if id(project) not in projects:
+            projects[id(project)] = len(projects)
+            project_cols['proj_id'].append(project.proj_id)
+            project_cols['project_code'].append(_intern(project.project_code))
+            project_cols['supervisor_crsid'].append(_intern(project.supervisor_crsid))
+
+        selection_cols['sel_id'].append(sel.sel_id)
+        selection_cols['serial'].append(sel.serial)
+        selection_cols['student'].append(_intern(sel.student.crsid))
+        selection_cols['project'].append(projects[id(project)])
+
+    encoded = [value.encode('utf8') for value in strings]
+    offsets = array('I', [0])
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    blob = b''.join(encoded)
+    blob += b'\0' * (-len(blob) % 4)
+
+    columns = [offsets,
+               *(project_cols[col] for col in PROJECT_COLUMNS),
+               *(selection_cols[col] for col in SELECTION_COLUMNS)]
+
+    with open(filename, 'wb') as snapfile:
+        snapfile.write(HEADER.pack(MAGIC, len(encoded), len(blob),
+                                   len(projects), len(selection_list)))
+        for column in columns:
+            if not _NATIVE_LITTLE:
+                column.byteswap()
+            column.tofile(snapfile)
+        snapfile.write(blob)
+
+
+class SelectionSnapshot:
+    """
+    Read only view of a snapshot file
+
+    The columns are memory mapped (no copy) and the selections are only built
+    when to_selection_list() is called.
+    """
+
+    def __init__(self, filename) -> None:
+        with open(filename, 'rb') as snapfile:
+            self._mmap = mmap.mmap(snapfile.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, n_strings, blob_len, n_projects, n_selections = \
+            HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{filename} is not a selection snapshot")
+
+        self.n_projects = n_projects
+        self.n_selections = n_selections
+        self._views = []
+
+        offset = HEADER.size
+        self._offsets, offset = self._column(offset, n_strings + 1)
+        for col in PROJECT_COLUMNS:
+            view, offset = self._column(offset, n_projects)
+            setattr(self, 'project_'+col, view)
+        for col in SELECTION_COLUMNS:
+            view, offset = self._column(offset, n_selections)
+            setattr(self, 'selection_'+col, view)
+        self._blob = offset
+        self._blob_len = blob_len
+
+    def _column(self, offset, length):
+        """A uint32 column starting at offset, returns the column and the next offset"""
+        end = offset + 4 * length
+        if _NATIVE_LITTLE:
+            view = memoryview(self._mmap)[offset:end].cast('I')
+            self._views.append(view)
+        else:
+            view = array('I', self._mmap[offset:end])
+            view.byteswap()
+        return view, end
+
+    def string(self, index):
+        """Decode an entry of the string table"""
+        start = self._blob + self._offsets[index]
+        end = self._blob + self._offsets[index + 1]
+        return self._mmap[start:end].decode('utf8')
+
+    def __len__(self):
+        return self.n_selections
+
+    def to_selection_list(self, selection_list=None):
+        """
+        Build the Project, Student and StudentSelection objects
+
+        :param selection_list: SelectionList to append to (a new one if omitted)
+        """
+        if selection_list is None:
+            selection_list = SelectionList([])
+
+        projects = [
+            Project(proj_id, self.string(supervisor), self.string(code))
+            for proj_id, code, supervisor in zip(
+                self.project_proj_id, self.project_project_code,
+                self.project_supervisor_crsid)]
+        students = {}
+
+        for sel_id, serial, student, project in zip(
+                self.selection_sel_id, self.selection_serial,
+                self.selection_student, self.selection_project):
+            if student not in students:
+                students[student] = Student(self.string(student))
+            selection_list.append(
+                StudentSelection(sel_id, serial, students[student], projects[project]))
+
+        return selection_list
+
+    def close(self):
+        """Release the memory map"""
+        for view in self._views:
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_snapshot(filename, selection_list=None):
+    """
+    Load the selections stored in a snapshot file
+
+    :param filename: snapshot file
+    :param selection_list: SelectionList to append to (a new one if omitted)
+    """
+    with SelectionSnapshot(filename) as snapshot:
+        return snapshot.to_selection_list(selection_list)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        print(f"usage: {sys.argv[0]} <filename> [snapshot_filename]")
+    else:
+        snapshot_file = sys.argv[2] if len(sys.argv) > 2 else \
+            os.path.splitext(sys.argv[1])[0]+'.snap'
+        selections = SelectionList([])
+        selections.load_selections(sys.argv[1])
+        write_snapshot(selections, snapshot_file)
+        print(f"{len(selections)} selections written to {snapshot_file}")
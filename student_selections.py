@@ -25,16 +25,22 @@ Pick  / set choice for students with least selections
 AC-3 arc consitancy (reduce the domains with knowledge of constraints)
 
 forward checking - remove selections taken or where the supervisor has max projects.
+(the backtrack search holds these domains as integer bitsets)
 minimum conflicts algorithm to pick next node?
 
 """
 
-from collections import Counter, namedtuple
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict, namedtuple
 import copy
-from functools import reduce
 
 import csv
+import gzip
+import math
+import random
 import re
+import statistics
+import time
 
 # unix only?
 import signal
@@ -86,28 +92,6 @@ class StudentSelection:
         self.student = student
         self.project = project
         self.allocated = False
-        # TODO This relates to the backtack search method only - should not be here
-        self.unavailable = 0
-
-    def set_unavailable(self, call):
-        """Mark this selection as hidden
-        The value it is marked as is the callid to the allocate method (for backtracking)"""
-        self.unavailable = call
-
-    # TODO relates to backtrack - should not be here
-    def is_available(self):
-        """Is this selection still active
-        TODO refactor to be available
-        """
-        return self.unavailable == 0
-
-    # TODO relates to backtrack - should not be here
-    def set_available(self):
-        """
-        set active
-        TODO: refactor to be available
-        """
-        self.unavailable = 0
 
     def is_allocated(self):
         """Has this selection been allocated?"""
@@ -116,18 +100,16 @@ class StudentSelection:
     def allocate(self):
         """Allocate the selection"""
         self.allocated = True
-        # Should we also set the selection to be unavailable / removed?
 
     def unallocate(self):
         """Un allocate the selection"""
         self.allocated = False
-        # Should we also set the selection to be unavailable / removed?
 
     def __str__(self):
         allocated = 'Yes' if self.allocated else 'No'
         return self.student.crsid+" -- "+str(self.project.project_code) +\
             " (project) by "+self.project.supervisor_crsid+" allocated: " +\
-            allocated+" unavailable: "+str(self.unavailable)
+            allocated
 
     # TODO This relates to lp_solve only - should not be here
     def lp_variable(self):
@@ -136,6 +118,9 @@ class StudentSelection:
 
 Student = namedtuple("Student", "crsid")
 
+# Grouped selections of the LP model (see SelectionLPSolver._lp_model)
+LPModel = namedtuple("LPModel", "objective students supervisors projects single_projects")
+
 class SelectionList(list):
     """
     A list of Selections
@@ -269,11 +254,29 @@ class SelectionList(list):
         """
         return sum(self._serials())
 
+    def rank_profile(self, max_serial=None):
+        """
+        Number of students allocated each serial [first choices, second, ...]
+
+        :param max_serial: length of the profile (default the largest serial allocated)
+        """
+        counts = Counter(self._serials())
+        if max_serial is None:
+            max_serial = max(counts, default=0)
+        return [counts[serial] for serial in range(1, max_serial + 1)]
+
     def _mean_and_variance(self):
         """
         Find the mean and the variance of the serials
         This could be used to find the optimum set ?
+
+        (nan, nan) if nothing is allocated, allocation_analytics computes
+        these for many sets at once
         """
+        serials = self._serials()
+        if not serials:
+            return math.nan, math.nan
+        return statistics.mean(serials), statistics.pvariance(serials)
 
     def clear_allocations(self):
         """Remove all the allocations made for this set"""
@@ -281,9 +284,25 @@ class SelectionList(list):
             sel.unallocate()
 
 
+    def save_snapshot(self, filename):
+        """
+        Write the selections to a binary snapshot (see selection_snapshot)
+
+        :param filename: snapshot file to create
+        """
+        from selection_snapshot import write_snapshot
+        write_snapshot(self, filename)
+
     def load_selections(self,filename):
         """
-        Load selections from the by student list as gathered from IIBprojects app"""
+        Load selections from the by student list as gathered from IIBprojects app
+
+        A binary snapshot (see selection_snapshot) is loaded without csv parsing"""
+        from selection_snapshot import is_snapshot, read_snapshot
+        if is_snapshot(filename):
+            read_snapshot(filename, self)
+            return
+
         # self.selections = SelectionList([])
         students = []
         projects = []
@@ -321,19 +340,24 @@ class SelectionList(list):
                         NUM_SELECTIONS += 1
                         NUM_PROJECTS += 1
 
-class SelectionBacktrackSolver():
+class SelectionSolver(ABC):
     """
-    Solve the allocation uisng backtrack algorithm
+    Common interface of the allocation engines
+
+    Engines load a selection list, are configured with the capacities and a
+    time budget then allocate() returns the allocation sets found
     """
 
     TIMEOUT = 10
-    MAX_PROJ_STUDENTS = 1
-    MAXPROJS = 4
+    # reduce the selections (see presolve) before solving
+    PRESOLVE = True
+    # max flow check every student can be allocated (see feasibility) before solving
+    CHECK_FEASIBILITY = True
 
     def __init__(self) -> None:
         self.selection_list = SelectionList([])
-        self.sets_found = []
-        self.max_priority = 1000000000
+        self.presolve_result = None
+        self.feasibility_result = None
 
     def load_selections(self,filename):
         """
@@ -341,163 +365,275 @@ class SelectionBacktrackSolver():
         """
         self.selection_list.load_selections(filename)
 
-    def _timeout_handler(self, signum, frame):
-        print(f"Timeout ({self.TIMEOUT}) occured {signum} {frame}")
-        raise Exception("TIMEOUT")
-
     def students(self):
         """Returns the students in the selection list"""
         return self.selection_list.students()
 
-    def _sets_still_possible(self):
-        """Are selection sets still possible for this set"""
-        return len(self.selection_list.allocated_selections())+len(self._available_students()) == \
-            len(self.students())
+    @abstractmethod
+    def configure(self, max_proj_students=None, max_projects_sup=None, timeout=None):
+        """
+        Set the capacities and time budget, None leaves the current value
 
-    def _selections_consistent(self, selection, max_priority):
-        """Test whether we have hit any contraint
+        :param max_proj_students: max students allocated to a project
+        :param max_projects_sup: max projects allocated to a supervisor
+        :param timeout: time budget in seconds
+        """
+        raise NotImplementedError
 
-        Supervisor's max allocations: MAXPROJS
-        Students without a project
-        Sets no longer possible
+    @abstractmethod
+    def project_capacity(self, project):
+        """Max students that can be allocated to the project"""
+        raise NotImplementedError
 
-        Heuristic total max priority > than already found
+    @abstractmethod
+    def supervisor_capacity(self, crsid):
+        """Max projects that can be allocated to the supervisor"""
+        raise NotImplementedError
 
-        :param selection: StudentSelection we have just attempted to allocate
-        :param max_priority: Lowest sum of serials for a set that has already been identified
-        """
-        num_allocated_supervisor = self.selection_list.supervisor_projects(
-            selection.project.supervisor_crsid)
-
-        return (len(num_allocated_supervisor) <= self.MAXPROJS
-                and len(self.missing_students()) == 0
-                and self._sets_still_possible()
-                and self.selection_list.total_serial() <= max_priority)
-
-    def _prune_project(self, project, call=1):
-        """Prune all unallocated selections containing the project
-
-        :param project: The project that has been allocated elsewhere
-        :type project: Project
-        :param call: The call we are pruning the student from
-        :type call: integer
-        """
-        # allow for two selections per project so first find number already allocated
-        if (len(list(filter(lambda sel: (sel.project.proj_id == project.proj_id and
-                                         sel.allocated is True), self.selection_list))) >= \
-                                             self.MAX_PROJ_STUDENTS):
-
-            for sel in list(filter(lambda selection:
-                                   (selection.unavailable == 0 and
-                                    selection.allocated is False and
-                                    selection.project.proj_id == project.proj_id), \
-                                        self.selection_list)):
-                sel.set_unavailable(call)
-
-    def _prune_student(self, student, call=1):
-        """Prune the students non-allocated choices
-
-        :param student: The student that has been allocated elsewhere
-        :type student: Student
-        :param call: The call we are pruning the student from
-        :type call: integer"""
-        for sel in list(filter(lambda selection:
-                               (selection.unavailable == 0 and
-                                selection.allocated is False and
-                                selection.student.crsid == student.crsid), self.selection_list)):
-            sel.set_unavailable(call)
+    def presolve(self):
+        """
+        Reduce the selection list before solving (if PRESOLVE)
 
-    def _set_complete(self):
-        """Have we completed a selection set"""
-        return len(self.selection_list.allocated_selections()) == len(self.students())
+        Fixed selections are allocated, returns the residual SelectionList
+        """
+        if not self.PRESOLVE:
+            return self.selection_list
+        from presolve import presolve
+        self.presolve_result = presolve(
+            self.selection_list, self.project_capacity, self.supervisor_capacity)
+        print(self.presolve_result.report())
+        return self.presolve_result.selection_list
+
+    def check_feasibility(self, selection_list=None):
+        """
+        Can every student be allocated (if CHECK_FEASIBILITY)
 
-    def _available_selections(self):
-        """Selections still active/available"""
-        return list(filter(lambda selection: selection.is_available() is True, self.selection_list))
+        Prints the report (why not and the capacity increases that would
+        help) when not, returns False if no allocation exists. The engines
+        check before presolve so the students reported are the ones whose
+        choices cover too few places, not those presolve left over
 
-    def _print_available_selections(self):
-        """For debug print out the list of selections we still need to allocate"""
-        for sel in self._available_selections():
-            print(sel)
+        :param selection_list: selections to check (default the selection list)
+        """
+        if not self.CHECK_FEASIBILITY:
+            return True
+        from feasibility import check_feasibility
+        self.feasibility_result = check_feasibility(
+            self.selection_list if selection_list is None else selection_list,
+            self.project_capacity, self.supervisor_capacity)
+        if not self.feasibility_result.feasible:
+            print(self.feasibility_result.report())
+        return self.feasibility_result.feasible
+
+    @abstractmethod
+    def allocate(self):
+        """Find allocation sets, returns a list of SelectionList"""
+        raise NotImplementedError
 
-    def _available_students(self):
-        """A list of available students left"""
-        return set(list(map(lambda selection: selection.student, self._available_selections())))
+class SelectionBacktrackSolver(SelectionSolver):
+    """
+    Solve the allocation uisng backtrack algorithm
 
-    def missing_students(self):
-        """Report the missing students
-        Those students not in our selection set (ie their selections are still available)
-        :param students: list of students to search for
-        """
-        available_selections = self._available_selections()
-        students_not_allocated = list(
-            map(lambda selection: selection.student, available_selections))
-        allocated_selections = self.selection_list.allocated_selections()
-        students_allocated = list(
-            map(lambda selections: selections.student, allocated_selections))
-        students_in_selections = [*students_allocated, *students_not_allocated]
-        return set(self.students()) ^ set(students_in_selections)
+    The domains are integer bitsets over the selection index (position in the
+    selection list): the available selections, and the selections of each
+    student, project and supervisor. Pruning is an AND with the complement of
+    a mask and undo restores the previous available bitset.
+
+    Students with identical ranked choices are interchangeable, with
+    SYMMETRY_BREAKING each is only searched with a serial no lower than the
+    previous student of its class (in search order) so each allocation is
+    found once rather than once per permutation of the students. (Project
+    places are counted, not assigned, so places are already interchangeable.)
+
+    Different assignment orders reach the same residual problem (eg two
+    students swapping projects of one supervisor). The residual state at a
+    depth is the load of the projects and supervisors the remaining students
+    chose (and the serials bounding their symmetry classes), a bounded LRU
+    table (MEMO_SIZE, 0 to disable) holds a lower bound on the cost of
+    completing each state searched - infinite when it has no completion - and
+    a state that cannot complete within max_priority is cut immediately.
+    """
 
-    def _allocate_selection(self, selection, call):
-        """
-        Allocates a selection
-        :param selection: StudentSelection to allocate
-        :param call: A serial ID used for backtracking
-         """
-        selection.allocate()
-        selection.set_unavailable(call)
-        self._prune_project(selection.project, call)
-        self._prune_student(selection.student, call)
+    TIMEOUT = 10
+    MAX_PROJ_STUDENTS = 1
+    MAXPROJS = 4
+    SYMMETRY_BREAKING = True
+    MEMO_SIZE = 100000
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.sets_found = []
+        self.max_priority = 1000000000
+        self.symmetry_classes = []
+        self.memo_hits = 0
+
+    def configure(self, max_proj_students=None, max_projects_sup=None, timeout=None):
+        if max_proj_students is not None:
+            self.MAX_PROJ_STUDENTS = max_proj_students
+        if max_projects_sup is not None:
+            self.MAXPROJS = max_projects_sup
+        if timeout is not None:
+            self.TIMEOUT = timeout
+
+    def project_capacity(self, project):
+        return self.MAX_PROJ_STUDENTS if project.allow_multiple else 1
+
+    def supervisor_capacity(self, crsid):
+        return self.MAXPROJS
+
+    def _timeout_handler(self, signum, frame):
+        print(f"Timeout ({self.TIMEOUT}) occured {signum} {frame}")
+        raise Exception("TIMEOUT")
 
-    def _allocate_non_conflicting_selections(self):
+    def _build_domains(self, selection_list):
         """
-        Allocate the selections for first choices
-        where there are no other selections and the supervisor
-        is not over the MAXPRROJS limit
+        Dense ids and bitset masks for the selection list
 
-        If complete the set will be added to the sets_found array
+        Selections already allocated are applied as the starting state
         """
+        self._selections = list(selection_list)
+        students = {}
+        projects = {}
+        supervisors = {}
+        self._students = []
+        self._sel_student = []
+        self._sel_project = []
+        self._sel_supervisor = []
+        self._student_mask = []
+        self._project_mask = []
+        self._supervisor_mask = []
+        self._project_cap = []
+
+        for index, sel in enumerate(self._selections):
+            bit = 1 << index
+            if sel.student.crsid not in students:
+                students[sel.student.crsid] = len(students)
+                self._students.append(sel.student)
+                self._student_mask.append(0)
+            if sel.project.project_code not in projects:
+                projects[sel.project.project_code] = len(projects)
+                self._project_mask.append(0)
+                self._project_cap.append(self.project_capacity(sel.project))
+            if sel.project.supervisor_crsid not in supervisors:
+                supervisors[sel.project.supervisor_crsid] = len(supervisors)
+                self._supervisor_mask.append(0)
+
+            student = students[sel.student.crsid]
+            project = projects[sel.project.project_code]
+            supervisor = supervisors[sel.project.supervisor_crsid]
+            self._sel_student.append(student)
+            self._sel_project.append(project)
+            self._sel_supervisor.append(supervisor)
+            self._student_mask[student] |= bit
+            self._project_mask[project] |= bit
+            self._supervisor_mask[supervisor] |= bit
+
+        # students involved with each project/supervisor (to re-check when pruned)
+        self._project_students = [self._mask_students(mask) for mask in self._project_mask]
+        self._supervisor_students = [self._mask_students(mask) for mask in self._supervisor_mask]
+
+        self._available = (1 << len(self._selections)) - 1
+        self._allocated = 0
+        self._allocated_students = 0
+        self._num_allocated = 0
+        self._cost = 0
+        self._proj_load = [0] * len(self._project_mask)
+        self._sup_load = [0] * len(self._supervisor_mask)
+        self._student_serial = [0] * len(self._students)
+
+        for index, sel in enumerate(self._selections):
+            if sel.is_allocated():
+                self._allocate_selection(index)
+
+    def _mask_students(self, mask):
+        """The student ids of the selections in the mask"""
+        return sorted({self._sel_student[index] for index in _bits(mask)})
+
+    def _allocate_selection(self, index):
+        """
+        Allocate the selection (index) and prune the domains
+        Returns the available bitset to pass to _unallocate_selection
+        """
+        previous = self._available
+        student = self._sel_student[index]
+        project = self._sel_project[index]
+        supervisor = self._sel_supervisor[index]
+
+        self._allocated |= 1 << index
+        self._allocated_students |= 1 << student
+        self._num_allocated += 1
+        self._cost += self._selections[index].serial
+        self._student_serial[student] = self._selections[index].serial
+        self._proj_load[project] += 1
+        self._sup_load[supervisor] += 1
+
+        available = previous & ~self._student_mask[student]
+        if self._proj_load[project] >= self._project_cap[project]:
+            available &= ~self._project_mask[project]
+        if self._sup_load[supervisor] >= self.MAXPROJS:
+            available &= ~self._supervisor_mask[supervisor]
+        self._available = available
+        return previous
+
+    def _unallocate_selection(self, index, previous):
+        """Undo _allocate_selection"""
+        student = self._sel_student[index]
+        self._allocated &= ~(1 << index)
+        self._allocated_students &= ~(1 << student)
+        self._num_allocated -= 1
+        self._cost -= self._selections[index].serial
+        self._proj_load[self._sel_project[index]] -= 1
+        self._sup_load[self._sel_supervisor[index]] -= 1
+        self._available = previous
+
+    def _selections_consistent(self, index):
+        """Test whether we have hit any contraint
 
-        # find the qualifying selections
+        Students without a project: a student of a project/supervisor that has
+        just been filled has no available selections left
 
-        def _count_selections(supervisor_count, sel):
-            if sel.project.supervisor_crsid in supervisor_count:
-                supervisor_count[sel.project.supervisor_crsid].append(sel)
-            else:
-                supervisor_count[sel.project.supervisor_crsid] = [sel]
-            return supervisor_count
-
-        # can we reduce the size of the set by allocating any serial 1 choices
-        # where the max number of projects for the supervisor > number of selections
-        selection_count = reduce(_count_selections, self.selection_list, {})
-
-        # Find selections that can be allocated
-        # The supervisor has < MAXPROJS selections
-        # The selections involved are not for the same project
-        can_allocate = list(
-            dict(
-                filter(
-                    lambda elem: len(elem[1]) <= self.MAXPROJS and
-                    len(list(map(lambda sel: sel.project.proj_id, elem[1]))) ==
-                    len(set(map(lambda sel: sel.project.proj_id, elem[1]))),
-                    selection_count.items())).values())
-
-        # Allocate the selections in our list that are first choice
-        flat_list = list(filter(lambda sel: sel.serial == 1,
-                                [item for sublist in can_allocate for item in sublist]))
-        for sel in flat_list:
-            if sel.serial == 1:
-                self._allocate_selection(sel, 1)
+        Heuristic total max priority > than already found
 
-        if self._set_complete():
-            found_list = SelectionList(self._copy_allocated_set())
-            self.sets_found.append(found_list)
-            print('+', end='', flush=True)
+        :param index: selection we have just allocated
+        """
+        if self._cost > self.max_priority:
+            return False
+
+        available = self._available
+        allocated = self._allocated_students
+        student_mask = self._student_mask
+        project = self._sel_project[index]
+        supervisor = self._sel_supervisor[index]
+
+        for students, full in (
+                (self._project_students[project],
+                 self._proj_load[project] >= self._project_cap[project]),
+                (self._supervisor_students[supervisor],
+                 self._sup_load[supervisor] >= self.MAXPROJS)):
+            if full:
+                for student in students:
+                    if not allocated >> student & 1 and not available & student_mask[student]:
+                        return False
+        return True
+
+    def _set_complete(self):
+        """Have we completed a selection set"""
+        return self._num_allocated == len(self._students)
+
+    def missing_students(self):
+        """Report the missing students
+        Those students not allocated and without any available selections
+        """
+        return {student for sid, student in enumerate(self._students)
+                if not self._allocated_students >> sid & 1
+                and not self._available & self._student_mask[sid]}
 
     def _copy_allocated_set(self):
         """return a SelectionList of selections that have been allocated"""
-        return copy.deepcopy(self.selection_list.allocated_selections())
-
+        found = copy.deepcopy([self._selections[index] for index in _bits(self._allocated)])
+        for sel in found:
+            sel.allocate()
+        return SelectionList(found)
 
     def _popular_projects(self, maxserial=100):
         """returns the most popular project ids in the selections
@@ -506,60 +642,99 @@ class SelectionBacktrackSolver():
 
         Use this to identify the next project to remove?
         """
-        filtered_by_serial = list(filter(lambda sel: sel.is_available(
-        ) and sel.serial <= maxserial and sel.allocated is False, self.selection_list))
-
         filtered_projects = Counter(
-            list(map(lambda sel: sel.project, filtered_by_serial)))
-        # dict(projectid) = num
-
-        return sorted(filtered_projects, key=Counter(filtered_projects).get, reverse=True)
-        # sorted(filtered_projects.items(), key=lambda pair: pair[1], reverse=True)
-        # orderby num desc -> take first
+            self._sel_project[index] for index in _bits(self._available)
+            if self._selections[index].serial <= maxserial)
 
+        return sorted(filtered_projects, key=filtered_projects.get, reverse=True)
 
+    def _symmetry_classes(self):
+        """
+        Group the students in the search order with identical available choices
 
-    def _students_available_selected_project(self, project):
-        """A list of students who have selected a project
+        Sets _previous_member: the student of the same class searched before
+        each student (None for the first of the class)
+        """
+        classes = {}
+        self._previous_member = [None] * len(self._students)
+        for student in self._search_order:
+            choices = tuple((self._selections[index].serial, self._sel_project[index])
+                            for index in _bits(self._available & self._student_mask[student]))
+            members = classes.setdefault(choices, [])
+            if members and self.SYMMETRY_BREAKING:
+                self._previous_member[student] = members[-1]
+            members.append(student)
+
+        self.symmetry_classes = [[self._students[student] for student in members]
+                                 for members in classes.values() if len(members) > 1]
+
+    def _residual_states(self):
+        """
+        What the search from each depth depends on, for the memo table
 
-        :param project: The project we are interested in
-        :param project: Project
+        Sets, per depth of the search order: the projects, supervisors and
+        (symmetry) previous members already searched that the remaining
+        students depend on, and _min_completion the sum of the remaining
+        students' lowest serials
         """
-        available_selections = self._available_selections()
-        selections_with_project = filter(
-            lambda sel: sel.project.proj_id == project.proj_id, available_selections)
-        return list(map(lambda selection: selection.student, selections_with_project))
+        order = self._search_order
+        position = {student: depth for depth, student in enumerate(order)}
+        projects = set()
+        supervisors = set()
+        self._memo = OrderedDict()
+        self._min_completion = [0] * (len(order) + 1)
+        self._memo_projects = [()] * len(order)
+        self._memo_supervisors = [()] * len(order)
+        self._memo_members = [()] * len(order)
+
+        for depth in reversed(range(len(order))):
+            choices = list(_bits(self._available & self._student_mask[order[depth]]))
+            projects.update(self._sel_project[index] for index in choices)
+            supervisors.update(self._sel_supervisor[index] for index in choices)
+            self._min_completion[depth] = self._min_completion[depth + 1] + \
+                min(self._selections[index].serial for index in choices)
+            self._memo_projects[depth] = tuple(sorted(projects))
+            self._memo_supervisors[depth] = tuple(sorted(supervisors))
+            self._memo_members[depth] = tuple(
+                member for member in map(self._previous_member.__getitem__, order[depth:])
+                if member is not None and position[member] < depth)
+
+    def _residual_key(self, depth):
+        """The memo key of the residual problem at depth"""
+        proj_load = self._proj_load
+        sup_load = self._sup_load
+        student_serial = self._student_serial
+        return (depth,
+                tuple([proj_load[project] for project in self._memo_projects[depth]]),
+                tuple([sup_load[supervisor] for supervisor in self._memo_supervisors[depth]]),
+                tuple([student_serial[member] for member in self._memo_members[depth]]))
 
     def students_by_popular_projects(self):
         """
         Join the list of students with the list of popular projects
 
-        return the students in the order of selections including popular projects
+        return the student ids in the order of selections including popular projects
         """
-        students_crsids = []
-        students = []
+        students = {}
         for project in self._popular_projects():
-            # if len(students) < 30:
-            #    print(project)
-            for student in self._students_available_selected_project(project):
-
-                # if len(students) < 10:
-                #    print(student)
-                if student.crsid not in students_crsids:
-                    students_crsids.append(student.crsid)
-                    # pop will provide students selecting the most popular
-                    # students.insert(0,student)
-                    # pop  will provide students selecting the least popular
-                    students.append(student)
-
-        # print(students)
-        return students
+            for index in _bits(self._available & self._project_mask[project]):
+                # students selecting the least popular are popped (searched) first
+                students.setdefault(self._sel_student[index], None)
+        return list(students)
 
     def allocate(self):
         """Find valid allocation SelectionList sets"""
-
+        # the diagnosis is of the selections as loaded, before presolve fixes any
+        if not self.check_feasibility():
+            print(f"\n{len(self.sets_found)} sets found")
+            return self.sets_found
         # allocate non-controversial selections
-        self._allocate_non_conflicting_selections()
+        selection_list = self.presolve()
+        self._build_domains(selection_list)
+
+        if self._set_complete():
+            self.sets_found.append(self._copy_allocated_set())
+            print('+', end='', flush=True)
 
         # Find the unallocated students
         # MORE - use heuristics to identify:
@@ -567,86 +742,214 @@ class SelectionBacktrackSolver():
         #   Whether the selection sets can be 'split'
         #       can we split the students up into groups that do not overlap?
 
-        # MORE - Order the student list by those that have chosen the most popular projects
-
         signal.signal(signal.SIGALRM, self._timeout_handler)
         signal.alarm(self.TIMEOUT)
 
-        students = self.students_by_popular_projects()
+        # popped from the end - search order
+        self._search_order = self.students_by_popular_projects()[::-1]
+        self._symmetry_classes()
+        self._residual_states()
         try:
-            self._allocate_backtrack_group_student(students, 2)
+            if not self.missing_students():
+                self._allocate_backtrack_group_student(0)
         except Exception as exc:
             print(f"Exception occured (timeout?): {exc}")
+        finally:
+            signal.alarm(0)
 
         print(f"\n{len(self.sets_found)} sets found")
 
         return self.sets_found
 
-    def backtrack(self, call=0):
-        """Re-instate the selections but not if it was the one we tried to allocate"""
-        # unprune
-        for sel in list(filter(lambda selection:
-                               (selection.unavailable >= call), self.selection_list)):
-
-            if sel.unavailable == call and sel.is_allocated():
-                # keep not available - tried and failed
-                sel.unallocate()
-            else:
-                sel.set_available()
-
-
-    def _students_available_selections(self, student):
-        """The available selections for this student"""
-        return filter(lambda sel: sel.student == student, self._available_selections())
-
-    #def _projects_available_selections(self, project):
-    #    """The available selections for this student"""
-    #    return filter(lambda sel: sel.project == project, self._available_selections())
-
-    def _allocate_backtrack_group_student(self, students, call=1):
+    def _allocate_backtrack_group_student(self, depth):
         """
         Backtrack worker for our search
-        """
-        call = call+1
-        mystudents = copy.deepcopy(students)
 
-        if len(students):
-            student = mystudents.pop()
-        else:
-            return
+        Returns a lower bound on the cost of completing the allocation from
+        this state (the remaining students' serials), math.inf if it cannot be
 
-        for sel in self._students_available_selections(student):
-            self._allocate_selection(sel, call)
-            # print(f"{call} --- Search selection {sel}")
-            if self._set_complete() and self.selection_list.total_serial() <= self.max_priority:
-                found_list = SelectionList(self._copy_allocated_set())
-                self.sets_found.append(found_list)
-                self.max_priority = self.selection_list.total_serial()
-                print('+ '+str(self.selection_list.total_serial()), end='', flush=True)
+        :param depth: position in the search order of the student to allocate
+        """
+        if depth == len(self._search_order):
+            return 0 if self._set_complete() else math.inf
+
+        key = None
+        if self.MEMO_SIZE:
+            key = self._residual_key(depth)
+            bound = self._memo.get(key)
+            if bound is not None:
+                self._memo.move_to_end(key)
+                # ties are still searched, they are further sets
+                if self._cost + bound > self.max_priority:
+                    self.memo_hits += 1
+                    return bound
+
+        student = self._search_order[depth]
+        # no lower serial than the interchangeable student before (symmetry)
+        member = self._previous_member[student]
+        min_serial = self._student_serial[member] if member is not None else 0
+        min_completion = self._min_completion[depth + 1]
+        best = math.inf
+
+        for index in _bits(self._available & self._student_mask[student]):
+            serial = self._selections[index].serial
+            if serial < min_serial:
+                continue
+            previous = self._allocate_selection(index)
+            if self._set_complete():
+                if self._cost <= self.max_priority:
+                    self.sets_found.append(self._copy_allocated_set())
+                    self.max_priority = self._cost
+                    print('+ '+str(self._cost), end='', flush=True)
+                completion = serial
+
+            elif self._cost + min_completion > self.max_priority:
+                completion = serial + min_completion
+
+            elif self._selections_consistent(index):
+                completion = serial + self._allocate_backtrack_group_student(depth + 1)
 
-            elif self._selections_consistent(sel, self.max_priority):
-                self._allocate_backtrack_group_student(mystudents, call)
+            else:
+                completion = math.inf
 
-            self.backtrack(call)
+            self._unallocate_selection(index, previous)
+            best = min(best, completion)
 
-    def _allocate_backtrack(self, call=0):
-        return self._allocate_backtrack_group_student(call)
+        if key is not None:
+            self._memo[key] = max(best, self._memo.get(key, 0))
+            self._memo.move_to_end(key)
+            if len(self._memo) > self.MEMO_SIZE:
+                self._memo.popitem(last=False)
+        return best
 
-class SelectionLPSolver():
+class SelectionLPSolver(SelectionSolver):
     """
     Solve the allocation of choices using an LP solver
     """
     MAX_STUDENT_PROJECTS = 2
     MAX_PROJECTS_SUP = 4
+    # lp_solve timeout in seconds (0 no limit)
+    TIMEOUT = 0
+    LP_FILENAME = 'lp_solve_file.txt'
+    # 'sum' of the serials or 'lexicographic': most first choices, then seconds ...
+    OBJECTIVE = 'sum'
+    # largest objective value held exactly by a double
+    MAX_EXACT_OBJECTIVE = 2 ** 53
+
+    def configure(self, max_proj_students=None, max_projects_sup=None, timeout=None):
+        if max_proj_students is not None:
+            self.MAX_STUDENT_PROJECTS = max_proj_students
+        if max_projects_sup is not None:
+            self.MAX_PROJECTS_SUP = max_projects_sup
+        if timeout is not None:
+            self.TIMEOUT = timeout
+
+    def project_capacity(self, project):
+        return self.MAX_STUDENT_PROJECTS if project.allow_multiple else 1
+
+    def supervisor_capacity(self, crsid):
+        return self.MAX_PROJECTS_SUP
+
+    def objective_weights(self, selection_list=None):
+        """
+        The objective coefficient of each serial {serial: weight}
 
-    def __init__(self) -> None:
-        self.selection_list = SelectionList([])
+        OBJECTIVE 'sum' weights each selection by its serial. 'lexicographic'
+        with n students and R serials weights rank r (1 the lowest serial)
+        (n+1)^(R-1) - (n+1)^(R-r): one more student at a rank outweighs any
+        change at the ranks below. None if the largest objective is not exact
+        in a double, the model is then solved rank by rank (_rank_stages).
 
-    def load_selections(self,filename):
+        :param selection_list: selections to model (default the selection list)
         """
-        Load selections from the by student list as gathered from IIBprojects app
+        if selection_list is None:
+            selection_list = self.selection_list
+        serials = sorted({sel.serial for sel in selection_list})
+        if self.OBJECTIVE == 'sum':
+            return {serial: serial for serial in serials}
+        if self.OBJECTIVE != 'lexicographic':
+            raise ValueError(f"unknown OBJECTIVE {self.OBJECTIVE}")
+
+        base = len(selection_list.students()) + 1
+        ranks = len(serials)
+        weights = {serial: base ** (ranks - 1) - base ** (ranks - rank)
+                   for rank, serial in enumerate(serials, 1)}
+        if (base - 1) * max(weights.values(), default=0) >= self.MAX_EXACT_OBJECTIVE:
+            return None
+        return weights
+
+    @staticmethod
+    def _rank_stages(objective):
         """
-        self.selection_list.load_selections(filename)
+        The variables allocated below each rank but the last (objective of serials)
+
+        Minimising each in turn, keeping the counts achieved, solves the
+        lexicographic objective rank by rank
+        """
+        ranks = sorted({serial for serial, _ in objective})
+        return [[variable for serial, variable in objective if serial > rank]
+                for rank in ranks[:-1]]
+
+    def allocate(self):
+        """
+        Generate the LP file and solve it with lpsolve55
+
+        The selections of the solution are allocated in the selection list,
+        returns a list containing the allocated set (empty if no solution can be found)
+        """
+        if not self.check_feasibility():
+            return []
+        selection_list = self.presolve()
+        if not selection_list.unallocated_selections():
+            # presolve allocated every student, there is nothing to solve
+            return [SelectionList(self.selection_list.allocated_selections())]
+
+        # only this engine needs lpsolve55 - import it when used
+        from lpsolve55 import lpsolve, IMPORTANT, LE
+
+        self.generate_solve_file(self.LP_FILENAME, selection_list)
+
+        lp = lpsolve('read_LP', self.LP_FILENAME)
+        lpsolve('set_verbose', lp, IMPORTANT)
+        names = lpsolve('get_col_name', lp)
+
+        # the objective of each solve, None the objective of the LP file
+        stages = [None]
+        if self.OBJECTIVE == 'lexicographic':
+            # the default relative gap would stop short on the large weights
+            lpsolve('set_mip_gap', lp, False, 0)
+            if self.objective_weights(selection_list) is None:
+                stages = self._rank_stages(self._lp_model(selection_list).objective) or stages
+        if self.TIMEOUT:
+            # the time budget is shared by the solves
+            lpsolve('set_timeout', lp, max(self.TIMEOUT // len(stages), 1))
+
+        values = None
+        for variables in stages:
+            if variables is not None:
+                variables = set(variables)
+                row = [1 if name in variables else 0 for name in names]
+                lpsolve('set_obj_fn', lp, row)
+            # 0 OPTIMAL, 1 SUBOPTIMAL (timeout with a solution), later stages
+            # are solved again from the last basis (warm start)
+            answer = lpsolve('solve', lp)
+            if answer not in (0, 1):
+                break
+            values = lpsolve('get_variables', lp)[0]
+            if variables is not None:
+                lpsolve('add_constraint', lp, row, LE, round(lpsolve('get_objective', lp)))
+        lpsolve('delete_lp', lp)
+
+        if values is None:
+            return []
+
+        # update our selection list with allocations -> find based on selection varaible
+        selections = {sel.lp_variable(): sel for sel in self.selection_list}
+        for name, result in zip(names, values):
+            if round(result) == 1:
+                selections[name].allocate()
+
+        return [SelectionList(self.selection_list.allocated_selections())]
 
     def projects_allocated_multiple(self,n):
         """
@@ -692,102 +995,524 @@ class SelectionLPSolver():
         # handle empty array
         return res[0]
 
-    def generate_solve_file(self, filename='lp_solve.lp'):
+    def _lp_model(self, selection_list=None):
+        """
+        Group the selections into the LP model in a single pass
+
+        Constraints are (lp variables, rhs) of the unallocated selections of
+        each student/supervisor/project, ordered as first met. Selections
+        already allocated are fixed: they reduce the rhs. Supervisor and project
+        constraints that can never bind (no more selections than the rhs) are
+        left out. The objective is (weight, lp variable), see objective_weights.
+
+        :param selection_list: selections to model (default the selection list)
+        """
+        if selection_list is None:
+            selection_list = self.selection_list
+        weights = self.objective_weights(selection_list)
+        objective = []
+        groups = {'student': {}, 'supervisor': {}, 'project': {}}
+        order = {'student': {}, 'supervisor': {}, 'project': {}, 'single': {}}
+        fixed = Counter()
+
+        for selection in selection_list:
+            keys = {'student': selection.student.crsid,
+                    'supervisor': selection.project.supervisor_crsid,
+                    'project': selection.project.lp_safe()}
+            if selection.is_allocated():
+                fixed.update(keys.items())
+                continue
+
+            variable = selection.lp_variable()
+            for kind, key in keys.items():
+                groups[kind].setdefault(key, []).append(variable)
+            objective.append((weights[selection.serial] if weights else selection.serial,
+                              variable))
+            project_kind = 'project' if selection.project.allow_multiple is True else 'single'
+            order['student'].setdefault(keys['student'], None)
+            order['supervisor'].setdefault(keys['supervisor'], None)
+            order[project_kind].setdefault(keys['project'], None)
+
+        def _rows(kind, group, capacity, binding_only=True):
+            rows = []
+            for key in order[kind]:
+                rhs = capacity - fixed[group, key]
+                if not binding_only or len(groups[group][key]) > rhs:
+                    rows.append((groups[group][key], rhs))
+            return rows
+
+        return LPModel(
+            objective,
+            _rows('student', 'student', 1, False),
+            _rows('supervisor', 'supervisor', self.MAX_PROJECTS_SUP),
+            _rows('project', 'project', self.MAX_STUDENT_PROJECTS),
+            _rows('single', 'project', 1, False))
+
+    def _constraint_rows(self, model):
+        """The constraint rows of the model as (comment, operator, [(variables, rhs)])"""
+        return [
+            ("ONE allocation per student", "=", model.students),
+            (f"MAX projects per supervisor: {self.MAX_PROJECTS_SUP}", "<=", model.supervisors),
+            (f"MAX students per project: {self.MAX_STUDENT_PROJECTS}", "<=", model.projects),
+            ("Restricted to single project per student: ", "<=", model.single_projects),
+        ]
+
+    def generate_solve_file(self, filename='lp_solve.lp', selection_list=None):
         """
         Creates an LP file
         This can be run externally or using the commands in this class
+
+        The rows are streamed to the file, a filename ending .gz is compressed
+
+        :param selection_list: selections to model (default the selection list)
         """
-        #MAX_PROJECTS_SUP = 4
-        #self.MAX_STUDENT_PROJECTS = 2
+        model = self._lp_model(selection_list)
 
-        objective_function = "min: "
+        with _open_model_file(filename) as lpfile:
+            lpfile.write("\n/*Minimise this*/\n")
+            lpfile.write("min: ")
+            for index, (serial, variable) in enumerate(model.objective):
+                lpfile.write(f"{' + ' if index else ''}{serial} {variable}")
+            lpfile.write(";\n")
+
+            for comment, operator, rows in self._constraint_rows(model):
+                lpfile.write(f"\n/*{comment}*/\n")
+                separator = ""
+                for row, rhs in rows:
+                    lpfile.write(f"{separator}{' + '.join(row)} {operator} {rhs};")
+                    separator = "\n"
+                lpfile.write("\n")
 
-        # The selections
-        declarations = []
+            lpfile.write("\n/*selection declarations*/\n")
+            separator = ""
+            for _, variable in model.objective:
+                lpfile.write(f"{separator}int {variable}")
+                separator = ";\n"
+            lpfile.write(";\n")
 
-        # miniise me
-        priorities = []
-        # total per project
-        # total per supervisor
-        # total per student
-        student_constraints = {}
-        project_constraints = {}
-        project_single_constraints = {}
-        supervisor_constraints = {}
+    def generate_mps_file(self, filename='lp_solve.mps', selection_list=None):
+        """
+        Creates a (free format) MPS file of the same model as generate_solve_file
+        Read by lp_solve with -fmps, a filename ending .gz is compressed
 
-        with open(filename, 'w', encoding='utf-8') as lpfile:
-            selection_list = self.selection_list
-            for selection in selection_list.unallocated_selections():
-                priorities.append(str(selection.serial) +
-                                " "+selection.lp_variable())
-                declarations.append(f"int {selection.lp_variable()}")
-
-                if selection.project.supervisor_crsid not in supervisor_constraints:
-                    crsid=selection.project.supervisor_crsid
-                    selections = list(
-                        map( lambda sel: sel.lp_variable(), \
-                                selection_list.supervisor_selections(crsid) ))
-                    supervisor_constraints[crsid] = selections
-
-                if selection.student.crsid not in student_constraints:
-                    crsid = selection.student.crsid
-                    selections = map(
-                        lambda sel: sel.lp_variable(), \
-                            selection_list.student_selections(crsid))
-                    student_constraints[crsid] = selections
-
-                if selection.project.allow_multiple is True and \
-                    selection.project.lp_safe() not in project_constraints:
-                    project = selection.project.lp_safe()
-                    selections = list(
-                        map( lambda sel: sel.lp_variable(), \
-                            selection_list.project_selections(project)))
-                    project_constraints[project] = selections
-
-                if selection.project.allow_multiple is False and \
-                    selection.project.lp_safe() not in project_single_constraints:
-                    project = selection.project.lp_safe()
-                    selections = map( lambda sel: sel.lp_variable(), \
-                        selection_list.project_selections(project))
-                    project_single_constraints[project] = selections
-
-
-            objective_function += ' + '.join(priorities)
+        :param selection_list: selections to model (default the selection list)
+        """
+        model = self._lp_model(selection_list)
+        columns = {variable: [('R0', serial)] for serial, variable in model.objective}
+        row_types = {'=': 'E', '<=': 'L'}
+        rows = []
+
+        for _, operator, constraint_rows in self._constraint_rows(model):
+            for row, rhs in constraint_rows:
+                name = f"R{len(rows)+1}"
+                rows.append((name, row_types[operator], rhs))
+                for variable in row:
+                    columns[variable].append((name, 1))
+
+        with _open_model_file(filename) as mpsfile:
+            mpsfile.write("NAME ALLOCATE\nROWS\n N R0\n")
+            for name, row_type, _ in rows:
+                mpsfile.write(f" {row_type} {name}\n")
+
+            mpsfile.write("COLUMNS\n MARKER 'MARKER' 'INTORG'\n")
+            for variable, entries in columns.items():
+                for name, value in entries:
+                    mpsfile.write(f" {variable} {name} {value}\n")
+            mpsfile.write(" MARKER 'MARKER' 'INTEND'\n")
+
+            mpsfile.write("RHS\n")
+            for name, _, rhs in rows:
+                mpsfile.write(f" RHS {name} {rhs}\n")
+
+            mpsfile.write("BOUNDS\n")
+            for variable in columns:
+                mpsfile.write(f" BV BND {variable}\n")
+            mpsfile.write("ENDATA\n")
+
+class SelectionCPSATSolver(SelectionLPSolver):
+    """
+    Solve the allocation with the OR-Tools CP-SAT solver
 
-            lpfile.write("\n/*Minimise this*/\n")
-            lpfile.write(objective_function+";\n")
-
-            lpfile.write("\n/*ONE allocation per student*/\n")
-            lpfile.write('\n'.join(list(map( \
-                lambda arr: (' + '.join(arr))+' = 1;', \
-                    list(student_constraints.values()))))+'\n')
-
-            lpfile.write(f"\n/*MAX projects per supervisor: {self.MAX_PROJECTS_SUP}*/\n")
-            supervisor_constraints=dict(
-                filter(lambda elem: len(elem[1]) > self.MAX_PROJECTS_SUP,\
-                    list(supervisor_constraints.items())))
-            lpfile.write('\n'.join(
-                list(map(
-                    lambda arr: (' + '.join(arr))+f" <= {self.MAX_PROJECTS_SUP};", \
-                        supervisor_constraints.values())))+'\n')
-
-            lpfile.write(f"\n/*MAX students per project: {self.MAX_STUDENT_PROJECTS}*/\n")
-            project_constraints=dict(filter(
-                lambda elem: len(elem[1]) > self.MAX_STUDENT_PROJECTS,\
-                    list(project_constraints.items())))
-            lpfile.write('\n'.join(list(map(
-                lambda arr: (' + '.join(arr))+f" <= {self.MAX_STUDENT_PROJECTS};", \
-                    list(project_constraints.values()))))+'\n')
-
-            lpfile.write("\n/*Restricted to single project per student: */\n")
-            lpfile.write('\n'.join(list(map(
-                lambda arr: (' + '.join(arr))+" <= 1;", \
-                    list(project_single_constraints.values()))))+'\n')
+    The model of generate_solve_file: a boolean per selection, one allocation
+    per student, the project, supervisor and single student project capacities
+    and the serials minimised. NUM_WORKERS search in parallel (0 all cores)
+    for up to TIMEOUT seconds (0 no limit), the best allocation found is
+    returned with the proven lower bound. Selections allocated before
+    allocate() are a hint to the search, not fixed.
 
-            lpfile.write("\n/*selection declarations*/\n")
-            lpfile.write((';\n'.join(declarations))+';\n')
+    A lexicographic OBJECTIVE is a single weighted solve, or when the weights
+    are too large a solve per rank each hinted with the allocation before.
+    """
+    TIMEOUT = 0
+    NUM_WORKERS = 0
+    SEED = None
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.best_cost = None
+        self.lower_bound = None
+        self.optimal = False
+
+    def gap(self):
+        """Relative gap between the best allocation found and the lower bound (sum objective)"""
+        if not self.best_cost or self.lower_bound is None:
+            return 0.0
+        return (self.best_cost - self.lower_bound) / self.best_cost
+
+    def allocate(self):
+        """
+        Build the CP-SAT model and solve it
+
+        The selections of the solution are allocated in the selection list,
+        returns a list containing the allocated set (empty if no solution can be found)
+        """
+        hint = {id(sel) for sel in self.selection_list.allocated_selections()}
+        self.selection_list.clear_allocations()
+        if not self.check_feasibility():
+            return []
+        selection_list = self.presolve()
+
+        # only this engine needs ortools - import it when used
+        from ortools.sat.python import cp_model
+
+        lp_model = self._lp_model(selection_list)
+
+        model = cp_model.CpModel()
+        variables = {variable: model.NewBoolVar(variable) for _, variable in lp_model.objective}
+        for _, operator, rows in self._constraint_rows(lp_model):
+            for row, rhs in rows:
+                expr = cp_model.LinearExpr.Sum([variables[variable] for variable in row])
+                model.Add(expr == rhs if operator == '=' else expr <= rhs)
+
+        selections = {sel.lp_variable(): sel for sel in selection_list.unallocated_selections()}
+        if hint:
+            hinted = {variable for variable, sel in selections.items() if id(sel) in hint}
+            for variable, var in variables.items():
+                model.AddHint(var, variable in hinted)
+
+        stages = []
+        if self.OBJECTIVE == 'lexicographic' and self.objective_weights(selection_list) is None:
+            stages = self._rank_stages(lp_model.objective)
+
+        solver = cp_model.CpSolver()
+        if self.TIMEOUT:
+            solver.parameters.max_time_in_seconds = self.TIMEOUT / max(len(stages), 1)
+        if self.NUM_WORKERS:
+            solver.parameters.num_workers = self.NUM_WORKERS
+        if self.SEED is not None:
+            solver.parameters.random_seed = self.SEED
+
+        solved = (cp_model.OPTIMAL, cp_model.FEASIBLE)
+        solution = None
+        if stages:
+            for stage in stages:
+                below = cp_model.LinearExpr.Sum([variables[variable] for variable in stage])
+                model.Minimize(below)
+                status = solver.Solve(model)
+                if status not in solved:
+                    break
+                solution = {variable: solver.BooleanValue(var)
+                            for variable, var in variables.items()}
+                solution_status = status
+                # the next rank starts from this allocation
+                model.ClearHints()
+                for variable, var in variables.items():
+                    model.AddHint(var, solution[variable])
+                model.Add(below <= round(solver.ObjectiveValue()))
+        else:
+            model.Minimize(cp_model.LinearExpr.WeightedSum(
+                [variables[variable] for _, variable in lp_model.objective],
+                [weight for weight, _ in lp_model.objective]))
+            solution_status = status = solver.Solve(model)
+            if status in solved:
+                solution = {variable: solver.BooleanValue(var)
+                            for variable, var in variables.items()}
+
+        if solution is None:
+            print(f"cp-sat: {solver.StatusName(status)}")
+            return []
+
+        # serials of the selections fixed by presolve
+        fixed = selection_list.total_serial()
+        for variable, allocated in solution.items():
+            if allocated:
+                selections[variable].allocate()
+
+        self.best_cost = self.selection_list.total_serial()
+        self.optimal = solution_status == cp_model.OPTIMAL
+        if self.OBJECTIVE == 'sum':
+            self.lower_bound = fixed + math.ceil(solver.BestObjectiveBound() - 1e-6)
+            print(f"cp-sat: {solver.StatusName(solution_status)} total serials {self.best_cost}"
+                  f" lower bound {self.lower_bound} gap {self.gap():.1%}"
+                  f" ({solver.WallTime():.2f}s)")
+        else:
+            self.lower_bound = None
+            print(f"cp-sat: {solver.StatusName(solution_status)} total serials {self.best_cost}"
+                  f" rank profile {self.selection_list.rank_profile()}"
+                  f" ({solver.WallTime():.2f}s)")
+        return [SelectionList(self.selection_list.allocated_selections())]
+
+class SelectionLocalSearchSolver(SelectionSolver):
+    """
+    Solve the allocation by local search (simulated annealing / min-conflicts)
+
+    Starts from the allocated selections (or a greedy allocation) and improves
+    it with shift, swap and ejection chain moves. Each move is scored by the
+    change (delta) it makes to the total serials, a student left without a
+    project costs more than any allocation (the largest serial times the
+    number of students, plus one). Runs for TIMEOUT seconds, presolve and the
+    feasibility check included, or until the lower bound (every student given
+    their best choice) is reached.
+    """
+    TIMEOUT = 10
+    MAX_STUDENT_PROJECTS = 2
+    MAX_PROJECTS_SUP = 4
+    SEED = None
+    # annealing temperature at the start and end of the time budget
+    START_TEMPERATURE = 2.0
+    END_TEMPERATURE = 0.05
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.best_cost = None
+        self.lower_bound = None
+        self.moves = 0
+
+    def configure(self, max_proj_students=None, max_projects_sup=None, timeout=None):
+        if max_proj_students is not None:
+            self.MAX_STUDENT_PROJECTS = max_proj_students
+        if max_projects_sup is not None:
+            self.MAX_PROJECTS_SUP = max_projects_sup
+        if timeout is not None:
+            self.TIMEOUT = timeout
+
+    def gap(self):
+        """Relative gap between the best allocation found and the lower bound"""
+        if not self.best_cost:
+            return 0.0
+        return (self.best_cost - self.lower_bound) / self.best_cost
+
+    def project_capacity(self, project):
+        return self.MAX_STUDENT_PROJECTS if project.allow_multiple else 1
+
+    def supervisor_capacity(self, crsid):
+        return self.MAX_PROJECTS_SUP
+
+    def _build_model(self, selection_list):
+        """
+        Dense ids for the search
 
-            lpfile.close()
+        Returns the options of each student [(selection, project, supervisor, serial)]
+        ordered by serial and the capacity of each project and supervisor
+        """
+        students = {}
+        projects = {}
+        supervisors = {}
+        options = []
+        project_caps = []
+        supervisor_caps = []
+
+        for sel in selection_list:
+            student = students.setdefault(sel.student.crsid, len(students))
+            if student == len(options):
+                options.append([])
+            if sel.project.project_code not in projects:
+                projects[sel.project.project_code] = len(projects)
+                project_caps.append(self.project_capacity(sel.project))
+            if sel.project.supervisor_crsid not in supervisors:
+                supervisors[sel.project.supervisor_crsid] = len(supervisors)
+                supervisor_caps.append(self.supervisor_capacity(sel.project.supervisor_crsid))
+            project = projects[sel.project.project_code]
+            supervisor = supervisors[sel.project.supervisor_crsid]
+            # a project chosen twice is only worth its best serial
+            if all(option[1] != project for option in options[student]):
+                options[student].append((sel, project, supervisor, sel.serial))
+
+        for student_options in options:
+            student_options.sort(key=lambda option: option[3])
+        return options, project_caps, supervisor_caps
+
+    def allocate(self):
+        """
+        Search for a low serial allocation within the time budget
+
+        The best allocation is allocated in the selection list, returns a list
+        containing the allocated set (empty if a student could not be allocated)
+        """
+        start = time.monotonic()
+        # the allocated selections are a starting point, not fixed by presolve
+        initial = {id(sel) for sel in self.selection_list.allocated_selections()}
+        self.selection_list.clear_allocations()
+        if not self.check_feasibility():
+            return []
+        selection_list = self.presolve()
+        initial.update(id(sel) for sel in selection_list.allocated_selections())
+
+        options, project_caps, supervisor_caps = self._build_model(selection_list)
+        num_students = len(options)
+        num_supervisors = len(supervisor_caps)
+        rng = random.Random(self.SEED)
+
+        max_serial = max((option[3] for opts in options for option in opts), default=0)
+        penalty = max_serial * num_students + 1
+        self.lower_bound = sum(opts[0][3] for opts in options)
+
+        assign = [-1] * num_students
+        proj_load = [0] * len(project_caps)
+        sup_load = [0] * num_supervisors
+        proj_students = [[] for _ in project_caps]
+        sup_students = [[] for _ in range(num_supervisors)]
+        # unallocated students, pos is the index of each in free (-1 if allocated)
+        free = list(range(num_students))
+        pos = list(range(num_students))
+        choice = [{option[1]: index for index, option in enumerate(opts)} for opts in options]
+
+        def student_cost(student):
+            index = assign[student]
+            return options[student][index][3] if index >= 0 else penalty
+
+        def move(student, index):
+            """Move the student to the option index (-1 unallocate)"""
+            current = assign[student]
+            if current >= 0:
+                _, project, supervisor, _ = options[student][current]
+                proj_load[project] -= 1
+                sup_load[supervisor] -= 1
+                proj_students[project].remove(student)
+                sup_students[supervisor].remove(student)
+            else:
+                last = free.pop()
+                if last != student:
+                    free[pos[student]] = last
+                    pos[last] = pos[student]
+                pos[student] = -1
+            if index >= 0:
+                _, project, supervisor, _ = options[student][index]
+                proj_load[project] += 1
+                sup_load[supervisor] += 1
+                proj_students[project].append(student)
+                sup_students[supervisor].append(student)
+            else:
+                pos[student] = len(free)
+                free.append(student)
+            assign[student] = index
+
+        def fits(project, supervisor):
+            return proj_load[project] < project_caps[project] and \
+                sup_load[supervisor] < supervisor_caps[supervisor]
+
+        # start from the allocated selections (eg a previous solution) then greedy
+        for student in sorted(range(num_students), key=lambda student: len(options[student])):
+            for index, (sel, project, supervisor, _) in enumerate(options[student]):
+                if id(sel) in initial and fits(project, supervisor):
+                    move(student, index)
+                    break
+        for student in sorted(free, key=lambda student: len(options[student])):
+            for index, (_, project, supervisor, _) in enumerate(options[student]):
+                if fits(project, supervisor):
+                    move(student, index)
+                    break
+
+        cost = sum(student_cost(student) for student in range(num_students))
+        best_cost = cost
+        best_assign = assign[:]
+
+        def shift_or_eject(student):
+            """Move the student to another choice, ejecting an occupant if it is full"""
+            opts = options[student]
+            index = rng.randrange(len(opts))
+            current = assign[student]
+            if index == current:
+                return None
+            _, project, supervisor, serial = opts[index]
+            old_project, old_supervisor = (opts[current][1], opts[current][2]) \
+                if current >= 0 else (-1, -1)
+            delta = serial - student_cost(student)
+
+            project_full = proj_load[project] >= project_caps[project]
+            supervisor_full = supervisor != old_supervisor and \
+                sup_load[supervisor] >= supervisor_caps[supervisor]
+            if not project_full and not supervisor_full:
+                return delta, ((student, index),)
+
+            # ejection chain: take the place of an occupant who moves to their best free choice
+            victim = rng.choice(proj_students[project] if project_full
+                                else sup_students[supervisor])
+            victim_project = options[victim][assign[victim]][1]
+            victim_index = -1
+            for other, (_, other_project, other_supervisor, _) in enumerate(options[victim]):
+                if other == assign[victim]:
+                    continue
+                load = proj_load[other_project] + (other_project == project) - \
+                    (other_project == victim_project) - (other_project == old_project)
+                sup = sup_load[other_supervisor] - (other_supervisor == old_supervisor)
+                if load < project_caps[other_project] and sup < supervisor_caps[other_supervisor]:
+                    victim_index = other
+                    break
+            victim_cost = options[victim][victim_index][3] if victim_index >= 0 else penalty
+            delta += victim_cost - student_cost(victim)
+            return delta, ((victim, -1), (student, index), (victim, victim_index))
+
+        def swap(student):
+            """Exchange projects with a student allocated to another of our choices"""
+            current = assign[student]
+            opts = options[student]
+            index = rng.randrange(len(opts))
+            if current < 0 or index == current:
+                return None
+            occupants = proj_students[opts[index][1]]
+            if not occupants:
+                return None
+            other = rng.choice(occupants)
+            other_index = choice[other].get(opts[current][1])
+            if other_index is None:
+                return None
+            delta = opts[index][3] + options[other][other_index][3] - \
+                student_cost(student) - student_cost(other)
+            return delta, ((student, -1), (other, other_index), (student, index))
+
+        temperature = self.START_TEMPERATURE
+        cooling = self.END_TEMPERATURE / self.START_TEMPERATURE
+        moves = 0
+        while best_cost > self.lower_bound:
+            moves += 1
+            if moves % 256 == 0:
+                elapsed = (time.monotonic() - start) / self.TIMEOUT if self.TIMEOUT else 1
+                if elapsed >= 1:
+                    break
+                temperature = self.START_TEMPERATURE * cooling ** elapsed
+
+            if free and rng.random() < 0.5:
+                student = rng.choice(free)
+            else:
+                student = rng.randrange(num_students)
+            proposal = swap(student) if rng.random() < 0.5 else shift_or_eject(student)
+            if proposal is None:
+                continue
+
+            delta, steps = proposal
+            if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                for step in steps:
+                    move(*step)
+                cost += delta
+                if cost < best_cost:
+                    best_cost = cost
+                    best_assign = assign[:]
+
+        self.selection_list.clear_allocations()
+        for student, index in enumerate(best_assign):
+            if index >= 0:
+                options[student][index][0].allocate()
+
+        unallocated = best_assign.count(-1)
+        self.moves = moves
+        self.best_cost = best_cost - unallocated * penalty
+        if unallocated:
+            print(f"local search: {moves} moves, {unallocated} students could not be allocated")
+            return []
+        print(f"local search: {moves} moves, total serials {self.best_cost}"
+              f" lower bound {self.lower_bound} gap {self.gap():.1%}")
+        return [SelectionList(self.selection_list.allocated_selections())]
 
 # functions to read a CSV file containing the selections and generate the selection_list
 # CSV student and their choices
@@ -797,6 +1522,21 @@ def project_sup(project_code):
     return match.group(1) if match else ''
 
 
+def _open_model_file(filename):
+    """Open a model file for (buffered) writing, gzip compressed if it ends .gz"""
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'wt', encoding='utf-8')
+    return open(filename, 'w', encoding='utf-8', buffering=1 << 20)
+
+
+def _bits(mask):
+    """The set bit positions of an integer bitset (ascending)"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
 def create_get_project(project_list, project):
     """
     Adds the project to our project list if not exists
@@ -0,0 +1,41 @@
+import csv
+import os
+import sys
+path = os.path.dirname(__file__)
+
+import pytest
+
+from allocate import get_engine, main
+from student_selections import SelectionBacktrackSolver, SelectionSolver
+
+
+def test_engine_registry():
+    """Engines are looked up by name"""
+    assert get_engine('backtrack') is SelectionBacktrackSolver
+
+
+def test_engine_interface():
+    """An engine must implement the solver interface"""
+    with pytest.raises(TypeError):
+        SelectionSolver()
+
+
+def test_cli_backtrack_csv(tmp_path):
+    """The sets are written in the requested format"""
+    output = str(tmp_path / "sets.csv")
+    assert main([path+"/sample_data/anon_selections_tiny.csv",
+                 "--timeout", "5", "--format", "csv", "--output", output]) == 0
+
+    with open(output, newline='', encoding='utf8') as csvfile:
+        rows = list(csv.DictReader(csvfile))
+    assert {row['set'] for row in rows} == {'0', '1'}
+    # the backtrack engine does not need the LP solver library
+    assert 'lpsolve55' not in sys.modules
+
+
+def test_cli_unsupported_option(capsys):
+    """An option the engine ignores is a usage error"""
+    with pytest.raises(SystemExit) as exit_info:
+        main([path+"/sample_data/anon_selections_tiny.csv", "--objective", "lexicographic"])
+    assert exit_info.value.code == 2
+    assert "--objective is not supported by the backtrack engine" in capsys.readouterr().err
@@ -0,0 +1,51 @@
+import os
+path = os.path.dirname(__file__)
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from allocation_analytics import AllocationSets
+from student_selections import SelectionBacktrackSolver
+
+
+def _tiny_sets():
+    bt_solver = SelectionBacktrackSolver()
+    bt_solver.load_selections(path+"/sample_data/anon_selections_tiny.csv")
+    return bt_solver.allocate()
+
+
+def test_measures_match_the_selection_lists():
+    """Each set is measured as its SelectionList would"""
+    selection_sets = _tiny_sets()
+    analytics = AllocationSets.from_selection_sets(selection_sets)
+
+    mean, variance = analytics.mean_and_variance()
+    for index, selection_set in enumerate(selection_sets):
+        assert analytics.total_serial()[index] == selection_set.total_serial()
+        assert (mean[index], variance[index]) == \
+            pytest.approx(selection_set._mean_and_variance())
+        assert analytics.projects_allocated_multiple(1)[index] == \
+            {project.project_code: count for project, count
+             in selection_set.projects_allocated_multiple(1).items()}
+
+    histogram = analytics.serial_histogram()
+    assert (histogram[:, 0] == 0).all()
+    assert (histogram.sum(axis=1) == len(analytics.students)).all()
+    assert (analytics.supervisor_load().sum(axis=1) == len(analytics.students)).all()
+
+
+def test_diff_between_sets():
+    """The students allocated differently are reported"""
+    analytics = AllocationSets([
+        (0, 'stu1', 'A-sup1-1', 'sup1', 1),
+        (0, 'stu2', 'A-sup2-1', 'sup2', 2),
+        (1, 'stu1', 'A-sup2-1', 'sup2', 1),
+        (1, 'stu2', 'A-sup1-1', 'sup1', 3),
+    ])
+
+    assert analytics.diff(0, 1) == [('stu1', 'A-sup1-1', 'A-sup2-1'),
+                                    ('stu2', 'A-sup2-1', 'A-sup1-1')]
+    assert analytics.distances().tolist() == [[0, 2], [2, 0]]
+    assert analytics.worst_off() == [(2, ['stu2']), (3, ['stu2'])]
+    assert analytics.serial_histogram().tolist() == [[0, 1, 1, 0], [0, 1, 0, 1]]
@@ -0,0 +1,75 @@
+import os
+path = os.path.dirname(__file__)
+
+import pytest
+
+from scripts.anonymize_selections import main, pseudonym
+from student_selections import SelectionList, project_sup
+
+HEADER = "CRS ID,Surname,Preferred name,College,,Choice 1,Choice 2,Choice 3,Choice 4,Choice 5,Group,Allocated to\n"
+FIRST = HEADER + """abc12,Smith,Ann,G,,C-xyz1-2,A-pqr9-1,,,,D,"C-xyz1-2
+*"
+def34,Jones,Bob,Q,,A-pqr9-1,,,,,F,A-pqr9-1
+"""
+SECOND = HEADER + """abc12,Smith,Ann,G,,A-pqr9-2,,,,,D,
+"""
+
+
+def _anonymize(tmp_path, key, output_dir):
+    for name, content in (("first.csv", FIRST), ("second.csv", SECOND)):
+        (tmp_path / name).write_text(content, encoding='utf8')
+    assert main([str(tmp_path / "first.csv"), str(tmp_path / "second.csv"),
+                 "--key", key, "--output-dir", str(tmp_path / output_dir), "--jobs", "1"]) == 0
+
+    lists = []
+    for name in ("anon_first.csv", "anon_second.csv"):
+        selections = SelectionList([])
+        selections.load_selections(str(tmp_path / output_dir / name))
+        lists.append(selections)
+    return lists
+
+
+def test_pseudonyms_join_across_files(tmp_path):
+    """The same key gives the same pseudonyms in every file, project_sup still parses them"""
+    first, second = _anonymize(tmp_path, "secret", "anon")
+    key = b"secret"
+
+    assert [sel.student.crsid for sel in first] == [pseudonym(key, "stu", "abc12")] * 2 + \
+        [pseudonym(key, "stu", "def34")]
+    assert second[0].student.crsid == first[0].student.crsid
+    assert [sel.project.supervisor_crsid for sel in first] == \
+        [pseudonym(key, "sup", "xyz1"), pseudonym(key, "sup", "pqr9"), pseudonym(key, "sup", "pqr9")]
+    assert second[0].project.supervisor_crsid == first[1].project.supervisor_crsid
+
+    with open(tmp_path / "anon" / "anon_first.csv", newline='', encoding='utf8') as anon:
+        allocated = anon.read().split(",D,")[1]
+    # the allocated cell keeps its marker line
+    assert allocated.startswith(f'"C-{pseudonym(key, "sup", "xyz1")}-2\n*"')
+    assert project_sup(allocated.strip('"')) == pseudonym(key, "sup", "xyz1")
+
+
+def test_different_key(tmp_path):
+    """Another key gives other pseudonyms"""
+    first, _ = _anonymize(tmp_path, "secret", "anon")
+    other, _ = _anonymize(tmp_path, "another", "other")
+
+    assert first[0].student.crsid != other[0].student.crsid
+    assert first[0].project.supervisor_crsid != other[0].project.supervisor_crsid
+
+
+def test_failed_file_reported(tmp_path, capsys):
+    """A file that cannot be read does not stop the others"""
+    (tmp_path / "first.csv").write_text(FIRST, encoding='utf8')
+
+    assert main([str(tmp_path / "missing.csv"), str(tmp_path / "first.csv"),
+                 "--key", "secret", "--jobs", "1"]) == 1
+
+    assert "missing.csv: not anonymized" in capsys.readouterr().err
+    assert (tmp_path / "anon_first.csv").exists()
+
+
+def test_jobs_at_least_one(tmp_path, capsys):
+    """--jobs 0 is a usage error, not a crash in the process pool"""
+    with pytest.raises(SystemExit):
+        main([str(tmp_path / "first.csv"), "--key", "secret", "--jobs", "0"])
+    assert "must be at least 1" in capsys.readouterr().err
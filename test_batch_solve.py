@@ -0,0 +1,57 @@
+import csv
+import os
+path = os.path.dirname(__file__)
+
+import pytest
+
+from batch_solve import ERROR, SOLVED, _output_names, main, selection_files
+
+
+def test_batch_continues_past_failures(tmp_path):
+    """A file that fails is reported and the others are still solved"""
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("# cohorts\n"
+                        f"{path}/sample_data/anon_selections_tiny.csv\n"
+                        f"{path}/fixtures/anon_selections_twosets.csv\n"
+                        "missing.csv\n")
+    assert len(selection_files(str(manifest))) == 3
+
+    summary = str(tmp_path / "summary.csv")
+    assert main([str(manifest), "--jobs", "2", "--timeout", "5",
+                 "--output-dir", str(tmp_path / "sets"), "--summary", summary]) == 1
+
+    with open(summary, newline='', encoding='utf8') as csvfile:
+        rows = {os.path.basename(row['filename']): row for row in csv.DictReader(csvfile)}
+    assert rows['anon_selections_tiny.csv']['status'] == SOLVED
+    assert rows['anon_selections_tiny.csv']['total_serial'] == '10'
+    assert rows['anon_selections_twosets.csv']['status'] == SOLVED
+    assert rows['missing.csv']['status'] == ERROR
+    assert (tmp_path / "sets" / "anon_selections_tiny.txt").exists()
+
+
+def test_output_names_unique():
+    """Files with the same name, or named like a renamed one, get distinct names"""
+    names = _output_names(["2024/group.csv", "2025/group.csv", "group_1.csv", "2026/group.csv"])
+
+    assert names == ["group", "group_1", "group_1_1", "group_2"]
+
+
+def test_jobs_at_least_one(capsys):
+    """--jobs 0 would never start a job"""
+    with pytest.raises(SystemExit):
+        main([path+"/sample_data", "--jobs", "0"])
+    assert "must be at least 1" in capsys.readouterr().err
+
+
+def test_lp_file_rejected(capsys):
+    """Jobs running at once cannot share one lp file"""
+    with pytest.raises(SystemExit):
+        main([path+"/sample_data", "--engine", "lp_solve", "--lp-file", "shared.lp"])
+    assert "--lp-file would be shared" in capsys.readouterr().err
+
+
+def test_missing_source(tmp_path, capsys):
+    """A source that does not exist is a usage error"""
+    with pytest.raises(SystemExit):
+        main([str(tmp_path / "missing.txt")])
+    assert "cannot read" in capsys.readouterr().err
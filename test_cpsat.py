@@ -0,0 +1,64 @@
+import os
+path = os.path.dirname(__file__)
+
+import pytest
+
+pytest.importorskip("ortools")
+
+from student_selections import SelectionCPSATSolver
+
+
+def test_cpsat_optimum():
+    """The optimum is found and proven by the bound"""
+    cpsat_solver = SelectionCPSATSolver()
+    cpsat_solver.load_selections(path+"/sample_data/anon_selections.csv")
+    cpsat_solver.configure(max_proj_students=2, max_projects_sup=4, timeout=60)
+
+    selection_sets = cpsat_solver.allocate()
+
+    assert len(selection_sets) == 1
+    assert selection_sets[0].total_serial() == 321
+    assert cpsat_solver.optimal
+    assert cpsat_solver.lower_bound == 321
+    assert len(selection_sets[0]) == len(cpsat_solver.students())
+
+
+def test_cpsat_hint_and_infeasible():
+    """A previous allocation is a hint, not a constraint"""
+    cpsat_solver = SelectionCPSATSolver()
+    cpsat_solver.load_selections(path+"/sample_data/anon_selections_59.csv")
+    cpsat_solver.configure(max_proj_students=2, max_projects_sup=1)
+    first = cpsat_solver.allocate()[0].total_serial()
+
+    # re-solved from the allocation found
+    assert cpsat_solver.allocate()[0].total_serial() == first == 71
+
+    cpsat_solver.configure(max_proj_students=2, max_projects_sup=0)
+    assert cpsat_solver.allocate() == []
+
+
+def test_cpsat_lexicographic():
+    """The most first choices, even at a higher total serial"""
+    cpsat_solver = SelectionCPSATSolver()
+    cpsat_solver.load_selections(path+"/sample_data/anon_selections.csv")
+    cpsat_solver.configure(max_proj_students=2, max_projects_sup=4, timeout=60)
+    cpsat_solver.OBJECTIVE = 'lexicographic'
+    selection_set = cpsat_solver.allocate()[0]
+
+    # the sum objective allocates 244 first choices, total 321
+    assert selection_set.rank_profile() == [250, 18, 5, 5, 1]
+    assert selection_set.total_serial() == 326
+
+
+def test_cpsat_lexicographic_by_rank():
+    """Solved rank by rank when the weights are too large"""
+    profiles = []
+    for max_exact_objective in (SelectionCPSATSolver.MAX_EXACT_OBJECTIVE, 1):
+        cpsat_solver = SelectionCPSATSolver()
+        cpsat_solver.load_selections(path+"/sample_data/anon_selections_59.csv")
+        cpsat_solver.configure(max_proj_students=2, max_projects_sup=1, timeout=60)
+        cpsat_solver.OBJECTIVE = 'lexicographic'
+        cpsat_solver.MAX_EXACT_OBJECTIVE = max_exact_objective
+        profiles.append(cpsat_solver.allocate()[0].rank_profile())
+
+    assert profiles[0] == profiles[1] == [47, 12]
@@ -0,0 +1,68 @@
+import os
+path = os.path.dirname(__file__)
+
+from feasibility import check_feasibility
+from student_selections import SelectionBacktrackSolver, SelectionLPSolver
+
+
+def test_feasible(load_selections):
+    """Every student can be allocated"""
+    result = check_feasibility(load_selections("/fixtures/anon_selections_twosets.csv"),
+                               lambda project: 1, lambda crsid: 4)
+
+    assert result.feasible
+    assert result.max_allocated == result.num_students == 3
+
+
+def test_single_student_project_flip(load_selections):
+    """stu3 and stu4 can only share G-supc-1, a single student project (supd takes none)"""
+    selections = load_selections("/fixtures/anon_selections_twosets.csv")
+    selections.add_single_student_project('G_supc_1')
+
+    result = check_feasibility(
+        selections,
+        lambda project: 2 if project.allow_multiple else 1,
+        lambda crsid: 0 if crsid == 'supd' else 4)
+
+    assert not result.feasible
+    assert result.max_allocated == 2
+    assert sorted(student.crsid for student in result.violating_students) == ['stu3', 'stu4']
+    assert [(project.project_code, capacity)
+            for project, capacity in result.bottleneck_projects] == [('G-supc-1', 1)]
+    assert [(suggestion.kind, suggestion.name, suggestion.single_student, suggestion.feasible)
+            for suggestion in result.suggestions] == [('project', 'G-supc-1', True, True),
+                                                      ('supervisor', 'supd', False, True)]
+
+
+def test_engine_stops_before_search():
+    """A full supervisor leaves stu116 without a place, nothing is searched"""
+    bt_solver = SelectionBacktrackSolver()
+    bt_solver.load_selections(path+"/sample_data/anon_selections_120.csv")
+    bt_solver.configure(max_proj_students=2, max_projects_sup=2, timeout=100)
+
+    assert bt_solver.allocate() == []
+    result = bt_solver.feasibility_result
+    assert not result.feasible
+    assert [student.crsid for student in result.unallocated_students] == ['stu116']
+    # the students sharing ib255's 2 places, not what presolve would leave of them
+    assert [student.crsid for student in result.violating_students] == \
+        ['stu19', 'stu68', 'stu116']
+    assert result.bottleneck_supervisors == [('ib255', 2)]
+    assert [(suggestion.kind, suggestion.name, suggestion.capacity, suggestion.feasible)
+            for suggestion in result.suggestions] == [('supervisor', 'ib255', 3, True)]
+
+
+def test_hall_violator():
+    """The violating students have one place fewer than there are students"""
+    lp_solver = SelectionLPSolver()
+    lp_solver.load_selections(path+"/sample_data/anon_selections.csv")
+    lp_solver.configure(max_proj_students=1, max_projects_sup=2)
+
+    result = check_feasibility(lp_solver.selection_list,
+                               lp_solver.project_capacity, lp_solver.supervisor_capacity)
+
+    assert not result.feasible
+    places = sum(capacity for _, capacity in result.bottleneck_projects) + \
+        sum(capacity for _, capacity in result.bottleneck_supervisors)
+    assert len(result.violating_students) == places + 1
+
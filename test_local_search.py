@@ -0,0 +1,60 @@
+import os
+import random
+import time
+path = os.path.dirname(__file__)
+
+from student_selections import SelectionLocalSearchSolver
+
+
+def _solver(filename):
+    ls_solver = SelectionLocalSearchSolver()
+    ls_solver.load_selections(path+filename)
+    ls_solver.SEED = 1
+    ls_solver.TIMEOUT = 1
+    return ls_solver
+
+
+def test_local_search_finds_optimum():
+    """Both students wanting the same project cannot have their first choice"""
+    ls_solver = _solver("/fixtures/anon_selections_twosets.csv")
+    ls_solver.MAX_STUDENT_PROJECTS = 1
+
+    selection_sets = ls_solver.allocate()
+
+    assert len(selection_sets) == 1
+    assert selection_sets[0].total_serial() == 4
+    assert ls_solver.lower_bound == 3
+
+
+def test_local_search_respects_capacities():
+    """No supervisor is allocated more than MAX_PROJECTS_SUP"""
+    ls_solver = _solver("/sample_data/anon_selections_59.csv")
+    ls_solver.MAX_PROJECTS_SUP = 2
+
+    selection_set = ls_solver.allocate()[0]
+
+    assert len(selection_set) == len(ls_solver.students())
+    for sel in selection_set:
+        assert len(selection_set.supervisor_projects(sel.project.supervisor_crsid)) <= 2
+
+
+def test_local_search_respects_timeout(tmp_path):
+    """A large cohort is allocated within TIMEOUT (setup included)"""
+    rng = random.Random(0)
+    projects = [f"A-sup{supervisor}-{index}" for supervisor in range(1000) for index in (1, 2, 3)]
+    cohort = tmp_path / "cohort.csv"
+    with open(cohort, 'w', encoding='utf8') as csvfile:
+        csvfile.write("CRS ID,Surname,Preferred name,College,,Choice 1,Choice 2,Choice 3,"
+                      "Choice 4,Choice 5,Group,Allocated to\n")
+        for student in range(3000):
+            csvfile.write(f"stu{student},a,b,G,,{','.join(rng.sample(projects, 5))},A,\n")
+    ls_solver = SelectionLocalSearchSolver()
+    ls_solver.load_selections(str(cohort))
+    ls_solver.SEED = 1
+    ls_solver.configure(max_proj_students=2, max_projects_sup=4, timeout=2)
+
+    started = time.monotonic()
+    selection_sets = ls_solver.allocate()
+
+    assert time.monotonic() - started < 3
+    assert len(selection_sets[0]) == 3000
@@ -0,0 +1,101 @@
+import gzip
+import os
+path = os.path.dirname(__file__)
+
+import pytest
+
+from student_selections import SelectionLPSolver
+
+TWOSETS_LP = """
+/*Minimise this*/
+min: 1 stu2_C_supa_2 + 1 stu3_G_supc_1 + 2 stu3_G_supd_1 + 1 stu4_G_supc_1 + 2 stu4_G_supd_1;
+
+/*ONE allocation per student*/
+stu2_C_supa_2 = 1;
+stu3_G_supc_1 + stu3_G_supd_1 = 1;
+stu4_G_supc_1 + stu4_G_supd_1 = 1;
+
+/*MAX projects per supervisor: 4*/
+
+
+/*MAX students per project: 1*/
+stu3_G_supc_1 + stu4_G_supc_1 <= 1;
+stu3_G_supd_1 + stu4_G_supd_1 <= 1;
+
+/*Restricted to single project per student: */
+
+
+/*selection declarations*/
+int stu2_C_supa_2;
+int stu3_G_supc_1;
+int stu3_G_supd_1;
+int stu4_G_supc_1;
+int stu4_G_supd_1;
+"""
+
+
+def _solver():
+    lp_solver = SelectionLPSolver()
+    lp_solver.load_selections(path+"/fixtures/anon_selections_twosets.csv")
+    lp_solver.MAX_STUDENT_PROJECTS = 1
+    return lp_solver
+
+
+def test_generate_solve_file(tmp_path):
+    """The LP file holds the objective and the binding constraints"""
+    lp_file = str(tmp_path / "twosets.lp")
+    _solver().generate_solve_file(lp_file)
+
+    with open(lp_file, encoding='utf-8') as lpfile:
+        assert lpfile.read() == TWOSETS_LP
+
+    _solver().generate_solve_file(lp_file+'.gz')
+    with gzip.open(lp_file+'.gz', 'rt', encoding='utf-8') as lpfile:
+        assert lpfile.read() == TWOSETS_LP
+
+
+def test_generate_mps_file(tmp_path):
+    """The MPS file has a row per LP constraint and a binary column per selection"""
+    mps_file = str(tmp_path / "twosets.mps")
+    _solver().generate_mps_file(mps_file)
+
+    with open(mps_file, encoding='utf-8') as mpsfile:
+        lines = mpsfile.read().splitlines()
+
+    assert lines[lines.index('ROWS')+1:lines.index('COLUMNS')] == \
+        [' N R0', ' E R1', ' E R2', ' E R3', ' L R4', ' L R5']
+    assert len([line for line in lines if line.startswith(' BV ')]) == 5
+
+
+def test_lexicographic_objective(tmp_path):
+    """A second choice weighs more than any number of first choices"""
+    lp_solver = _solver()
+    lp_solver.OBJECTIVE = 'lexicographic'
+    # 3 students, 2 ranks: (3+1)^1 - (3+1)^(2-r)
+    assert lp_solver.objective_weights() == {1: 0, 2: 3}
+
+    lp_file = str(tmp_path / "twosets.lp")
+    lp_solver.generate_solve_file(lp_file)
+    with open(lp_file, encoding='utf-8') as lpfile:
+        assert lpfile.read().splitlines()[2] == "min: 0 stu2_C_supa_2 + 0 stu3_G_supc_1 +\
+ 3 stu3_G_supd_1 + 0 stu4_G_supc_1 + 3 stu4_G_supd_1;"
+
+    # weights that are not exact are solved rank by rank
+    lp_solver.MAX_EXACT_OBJECTIVE = 8
+    assert lp_solver.objective_weights() is None
+    assert lp_solver._rank_stages(lp_solver._lp_model().objective) == \
+        [['stu3_G_supd_1', 'stu4_G_supd_1']]
+
+
+@pytest.mark.parametrize('max_exact_objective', [SelectionLPSolver.MAX_EXACT_OBJECTIVE, 1])
+def test_lexicographic_solve(tmp_path, max_exact_objective):
+    """The weighted solve and the solve rank by rank allocate the same profile"""
+    pytest.importorskip("lpsolve55")
+    lp_solver = SelectionLPSolver()
+    lp_solver.load_selections(path+"/sample_data/anon_selections_59.csv")
+    lp_solver.configure(max_proj_students=2, max_projects_sup=1, timeout=60)
+    lp_solver.LP_FILENAME = str(tmp_path / "59.lp")
+    lp_solver.OBJECTIVE = 'lexicographic'
+    lp_solver.MAX_EXACT_OBJECTIVE = max_exact_objective
+
+    assert lp_solver.allocate()[0].rank_profile() == [47, 12]
@@ -8,6 +8,59 @@ def test_twosets_found():
     """All selections can be allocated immediately"""
     bt_solver = SelectionBacktrackSolver()
     bt_solver.load_selections(path+"/fixtures/anon_selections_twosets.csv")
+    bt_solver.SYMMETRY_BREAKING = False
 
 
     assert len(bt_solver.allocate()) == 2
+
+
+def test_sets_respect_supervisor_max():
+    """A supervisor taking one project splits the students across supervisors"""
+    bt_solver = SelectionBacktrackSolver()
+    bt_solver.load_selections(path+"/fixtures/anon_selections_twosets.csv")
+    bt_solver.MAX_PROJ_STUDENTS = 2
+    bt_solver.MAXPROJS = 1
+
+    sets_found = bt_solver.allocate()
+
+    assert len(sets_found) == 1
+    assert len(sets_found[0].supervisor_projects('supc')) == 1
+
+
+def test_interchangeable_students_found_once():
+    """stu3 and stu4 made the same choices, swapping them is the same set"""
+    bt_solver = SelectionBacktrackSolver()
+    bt_solver.load_selections(path+"/fixtures/anon_selections_twosets.csv")
+
+    assert len(bt_solver.allocate()) == 1
+    assert [sorted(student.crsid for student in members)
+            for members in bt_solver.symmetry_classes] == [['stu3', 'stu4']]
+
+
+def test_memo_finds_the_same_sets():
+    """Cutting repeated residual states does not lose any (tied) sets"""
+    sets_found = []
+    for memo_size in (0, SelectionBacktrackSolver.MEMO_SIZE):
+        bt_solver = SelectionBacktrackSolver()
+        bt_solver.load_selections(path+"/sample_data/anon_selections_59.csv")
+        bt_solver.MAXPROJS = 2
+        bt_solver.MEMO_SIZE = memo_size
+        sets_found.append([sorted((sel.student.crsid, sel.project.project_code)
+                                  for sel in selection_set)
+                           for selection_set in bt_solver.allocate()])
+
+    assert bt_solver.memo_hits > 0
+    assert sets_found[0] == sets_found[1]
+
+
+def test_single_student_project_respected():
+    """A single student project takes one student whatever MAX_PROJ_STUDENTS"""
+    bt_solver = SelectionBacktrackSolver()
+    bt_solver.load_selections(path+"/fixtures/anon_selections_twosets.csv")
+    bt_solver.MAX_PROJ_STUDENTS = 2
+    bt_solver.selection_list.add_single_student_project('G_supc_1')
+
+    sets_found = bt_solver.allocate()
+
+    assert len(sets_found) == 1
+    assert len(sets_found[0].project_selections('G_supc_1')) == 1
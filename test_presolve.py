@@ -0,0 +1,56 @@
+import os
+import sys
+path = os.path.dirname(__file__)
+
+from presolve import FIXED_SINGLE, presolve
+from student_selections import SelectionBacktrackSolver, SelectionLPSolver
+
+
+def test_presolve_fixes_single_choice(load_selections):
+    """stu2 only made one choice, stu3 and stu4 compete for the same projects"""
+    selections = load_selections("/fixtures/anon_selections_twosets.csv")
+
+    result = presolve(selections, lambda project: 1, lambda crsid: 4)
+
+    assert [(sel.student.crsid, reason) for sel, reason in result.fixed] == \
+        [('stu2', FIXED_SINGLE)]
+    assert {sel.student.crsid for sel in result.selection_list.unallocated_selections()} == \
+        {'stu3', 'stu4'}
+    assert result.relaxed_supervisors == ['supc', 'supd']
+
+
+def test_presolve_reports_students_without_choice(load_selections):
+    """Full supervisors can leave a student with nothing to choose"""
+    selections = load_selections("/sample_data/anon_selections_120.csv")
+
+    result = presolve(selections, lambda project: 2, lambda crsid: 2)
+
+    assert [student.crsid for student in result.infeasible_students] == ['stu116']
+    # their selections stay in the residual problem
+    assert selections.student_selections('stu116')[0] in result.selection_list
+
+
+def test_presolve_keeps_optimum():
+    """The backtrack search finds the same best total with and without presolve"""
+    totals = []
+    for use_presolve in (True, False):
+        bt_solver = SelectionBacktrackSolver()
+        bt_solver.load_selections(path+"/sample_data/anon_selections_tiny.csv")
+        bt_solver.PRESOLVE = use_presolve
+        totals.append(bt_solver.allocate()[-1].total_serial())
+
+    assert totals[0] == totals[1]
+
+
+def test_presolve_allocates_everyone(tmp_path):
+    """No LP file is written or solved when presolve allocates every student"""
+    lp_solver = SelectionLPSolver()
+    lp_solver.load_selections(path+"/sample_data/anon_selections_titchy.csv")
+    lp_solver.LP_FILENAME = str(tmp_path / "titchy.lp")
+
+    selection_sets = lp_solver.allocate()
+
+    assert len(selection_sets) == 1
+    assert len(selection_sets[0]) == len(lp_solver.students())
+    assert not os.path.exists(lp_solver.LP_FILENAME)
+    assert 'lpsolve55' not in sys.modules
@@ -0,0 +1,45 @@
+import os
+path = os.path.dirname(__file__)
+
+from selection_snapshot import SelectionSnapshot, is_snapshot
+from student_selections import SelectionBacktrackSolver, SelectionList
+
+
+def _selection_rows(selection_list):
+    return [(sel.sel_id, sel.serial, sel.student.crsid, sel.project.proj_id,
+             sel.project.project_code, sel.project.supervisor_crsid)
+            for sel in selection_list]
+
+
+def test_snapshot_round_trip(tmp_path):
+    """The snapshot reproduces the selections parsed from the csv"""
+    selections = SelectionList([])
+    selections.load_selections(path+"/sample_data/anon_selections_tiny.csv")
+    snapshot_file = str(tmp_path / "tiny.snap")
+    selections.save_snapshot(snapshot_file)
+
+    assert is_snapshot(snapshot_file)
+    with SelectionSnapshot(snapshot_file) as snapshot:
+        assert len(snapshot) == len(selections)
+        assert list(snapshot.selection_serial) == [sel.serial for sel in selections]
+
+    loaded = SelectionList([])
+    loaded.load_selections(snapshot_file)
+    assert _selection_rows(loaded) == _selection_rows(selections)
+
+
+def test_solver_loads_snapshot(tmp_path):
+    """Solvers accept a snapshot in place of the csv"""
+    selections = SelectionList([])
+    selections.load_selections(path+"/fixtures/anon_selections_twosets.csv")
+    snapshot_file = str(tmp_path / "twosets.snap")
+    selections.save_snapshot(snapshot_file)
+
+    sets_found = []
+    for filename in (path+"/fixtures/anon_selections_twosets.csv", snapshot_file):
+        bt_solver = SelectionBacktrackSolver()
+        bt_solver.load_selections(filename)
+        sets_found.append([_selection_rows(selection_set)
+                           for selection_set in bt_solver.allocate()])
+
+    assert sets_found[0] == sets_found[1]